@@ -1,5 +1,19 @@
 from django.contrib import admin
-from .models import CustomUser
+from .models import CustomUser, Category, Task
 
 admin.site.register(CustomUser)
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    search_fields = ('name',)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_at', 'updated_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'locked_by', 'last_error')
 # Register your models here.
@@ -0,0 +1,183 @@
+"""Seller dashboard numbers, computed in the database rather than in Python.
+
+Sales figures come from the SellerDailySales / ProductDailySales rollups,
+which ``record_order_sales`` bumps as orders are placed, so dashboards cost
+O(days shown) rather than O(order items ever sold). Cancelling or deleting
+an order takes it back out (``retract_order_sales``, hooked up in
+``signals.py``), so the rollups stay what ``rebuild_sales_rollup`` would
+compute. Queryset ``update()``/``delete()`` calls send no signals; run a
+rebuild after those.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import OrderItem, Product, ProductDailySales, SellerDailySales
+
+LOW_STOCK_THRESHOLD = 5
+SALES_WINDOW_DAYS = 30
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def inventory_summary(seller):
+    """Product count, units in stock, stock value and low-stock count in one query."""
+    totals = Product.objects.filter(seller=seller).aggregate(
+        total_products=Count('id'),
+        total_quantity=Sum('quantity'),
+        total_value=Sum(F('price') * F('quantity'), output_field=MONEY),
+        low_stock=Count('id', filter=Q(quantity__lte=LOW_STOCK_THRESHOLD)),
+    )
+    return {
+        'total_products': totals['total_products'],
+        'total_quantity': totals['total_quantity'] or 0,
+        'total_value': totals['total_value'] or Decimal('0'),
+        'low_stock': totals['low_stock'],
+    }
+
+
+def sales_by_day(seller, days=SALES_WINDOW_DAYS):
+    """Revenue, units and order count per day for the last ``days`` days.
+
+    Returns dicts ordered by day, oldest first.
+    """
+    since = timezone.localdate() - timedelta(days=days)
+    return list(
+        SellerDailySales.objects.filter(seller=seller, day__gte=since)
+        .values('day', 'revenue', 'units', 'orders')
+        .order_by('day')
+    )
+
+
+def top_products(seller, days=SALES_WINDOW_DAYS, limit=5):
+    """The seller's best-selling products by revenue over the last ``days`` days."""
+    since = timezone.localdate() - timedelta(days=days)
+    return list(
+        ProductDailySales.objects.filter(seller=seller, day__gte=since)
+        .values('product_id', 'product__name')
+        .annotate(revenue=Sum('revenue'), units=Sum('units'), orders=Sum('orders'))
+        .order_by('-revenue')[:limit]
+    )
+
+
+def sales_totals(daily_sales):
+    """Fold ``sales_by_day`` rows into window totals."""
+    return {
+        'revenue': sum((row['revenue'] for row in daily_sales), Decimal('0')),
+        'units': sum(row['units'] for row in daily_sales),
+        'orders': sum(row['orders'] for row in daily_sales),
+    }
+
+
+# ---------------------------
+# Rollup maintenance
+# ---------------------------
+def record_order_sales(order, order_items):
+    """Add a freshly placed (or un-cancelled) order to the daily sales rollups.
+
+    The day's rows are first created empty where missing, with one
+    ``INSERT ... ON CONFLICT DO NOTHING`` per table (which also settles two
+    checkouts racing to create a row), then incremented in place. So the
+    first sale of the day costs the same as any other.
+    """
+    rows = list(_order_sales(order, order_items))
+    for model in (ProductDailySales, SellerDailySales):
+        model.objects.bulk_create(
+            [model(**lookup, **defaults) for row_model, lookup, defaults, _, _ in rows if row_model is model],
+            ignore_conflicts=True,
+        )
+    for model, lookup, defaults, revenue, units in rows:
+        model.objects.filter(**lookup).update(
+            revenue=F('revenue') + revenue, units=F('units') + units, orders=F('orders') + 1,
+        )
+
+
+def retract_order_sales(order, order_items):
+    """Take a cancelled or deleted order back out of the daily sales rollups.
+
+    Rows left without orders are deleted, as a rebuild wouldn't have them.
+    """
+    for model, lookup, defaults, revenue, units in _order_sales(order, order_items):
+        rows = model.objects.filter(**lookup)
+        rows.update(revenue=F('revenue') - revenue, units=F('units') - units, orders=F('orders') - 1)
+        rows.filter(orders__lte=0).delete()
+
+
+def _order_sales(order, order_items):
+    """Yield ``(model, lookup, defaults, revenue, units)`` per rollup row an order touches."""
+    day = timezone.localdate(order.created_at)
+    by_product = defaultdict(lambda: [Decimal('0'), 0])
+    by_seller = defaultdict(lambda: [Decimal('0'), 0])
+    sellers = {}
+    for item in order_items:
+        revenue = item.price * item.quantity
+        sellers[item.product_id] = item.product.seller_id
+        for totals in (by_product[item.product_id], by_seller[item.product.seller_id]):
+            totals[0] += revenue
+            totals[1] += item.quantity
+
+    for product_id, (revenue, units) in by_product.items():
+        yield (ProductDailySales, {'product_id': product_id, 'day': day},
+               {'seller_id': sellers[product_id]}, revenue, units)
+    for seller_id, (revenue, units) in by_seller.items():
+        yield SellerDailySales, {'seller_id': seller_id, 'day': day}, {}, revenue, units
+
+
+def rebuild_sales_rollup(seller=None, batch_size=1000):
+    """Recompute the rollups from OrderItem (all sellers, or just ``seller``).
+
+    Cancelled orders are left out. Returns ``(seller_rows, product_rows)``.
+    """
+    items = OrderItem.objects.exclude(order__status='cancelled')
+    seller_rows = SellerDailySales.objects.all()
+    product_rows = ProductDailySales.objects.all()
+    if seller is not None:
+        items = items.filter(product__seller=seller)
+        seller_rows = seller_rows.filter(seller=seller)
+        product_rows = product_rows.filter(seller=seller)
+
+    items = items.annotate(day=TruncDate('order__created_at'))
+    revenue = Sum(F('price') * F('quantity'), output_field=MONEY)
+
+    product_totals = items.values('product_id', 'day').annotate(
+        seller_id=F('product__seller_id'),
+        revenue=revenue,
+        units=Sum('quantity'),
+        orders=Count('order', distinct=True),
+    ).order_by()
+    seller_totals = items.values('product__seller_id', 'day').annotate(
+        revenue=revenue,
+        units=Sum('quantity'),
+        orders=Count('order', distinct=True),
+    ).order_by()
+
+    with transaction.atomic():
+        seller_rows.delete()
+        product_rows.delete()
+        product_count = _bulk_create_batched(
+            ProductDailySales,
+            product_totals.iterator(),
+            batch_size,
+        )
+        seller_count = _bulk_create_batched(
+            SellerDailySales,
+            ({'seller_id': row.pop('product__seller_id'), **row} for row in seller_totals.iterator()),
+            batch_size,
+        )
+    return seller_count, product_count
+
+
+def _bulk_create_batched(model, rows, batch_size):
+    """bulk_create ``rows`` (dicts of field values) without holding them all in memory."""
+    created = 0
+    rows = iter(rows)
+    while batch := [model(**row) for row in islice(rows, batch_size)]:
+        model.objects.bulk_create(batch)
+        created += len(batch)
+    return created
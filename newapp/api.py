@@ -0,0 +1,169 @@
+"""JSON API (``/api/...``): the public catalog, and the user's cart and orders.
+
+The catalog is public, so those views skip authentication entirely (which
+also keeps ``Vary: Cookie`` off the responses). Responses carry the catalog
+and stock versions (see ``catalog.py``) as ETag and Last-Modified, so
+clients can revalidate with a bodiless 304, plus a short public
+``Cache-Control`` for intermediaries.
+
+Cart and order endpoints need a session or token (see ``REST_FRAMEWORK``
+in settings). ``PATCH /api/cart/`` applies any number of quantity changes
+in one transaction, so a client can sync its whole cart in one round-trip.
+"""
+from datetime import datetime, timezone
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+from rest_framework import generics, status
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import carts
+from .catalog import get_catalog_version, get_category_listing, get_stock_version
+from .models import CartItem, Order, Product
+from .orders import CheckoutError, OutOfStock, place_order
+from .serializers import (
+    CartItemSerializer, CartUpdateSerializer, CategoryListingSerializer, OrderSerializer,
+    ProductSerializer,
+)
+
+API_CACHE_SECONDS = 60
+
+
+def _catalog_etag(request, *args, **kwargs):
+    # Products carry their stock level: a detail changes with its own stock,
+    # a list with anyone's
+    return f'catalog-{get_catalog_version()}-{get_stock_version(kwargs.get("pk"))}'
+
+
+def _catalog_last_modified(request, *args, **kwargs):
+    version = max(get_catalog_version(), get_stock_version(kwargs.get('pk')))
+    return datetime.fromtimestamp(version / 1000, tz=timezone.utc)
+
+
+catalog_http_caching = [
+    condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified),
+    cache_control(public=True, max_age=API_CACHE_SECONDS),
+    vary_on_headers('Accept'),
+]
+
+
+class NewestFirstPagination(CursorPagination):
+    """Opaque ``?cursor=`` pages over ``(created_at, id)``, newest first."""
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+@method_decorator(catalog_http_caching, name='dispatch')
+class ProductList(generics.ListAPIView):
+    """Available products, newest first. Filter with ``?category=<slug>``."""
+    serializer_class = ProductSerializer
+    pagination_class = NewestFirstPagination
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    query_budget = 2
+
+    def get_queryset(self):
+        products = Product.objects.for_listing().filter(is_available=True)
+        category = self.request.query_params.get('category')
+        if category:
+            products = products.filter(category__slug=category)
+        return products
+
+
+@method_decorator(catalog_http_caching, name='dispatch')
+class ProductDetail(generics.RetrieveAPIView):
+    serializer_class = ProductSerializer
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    query_budget = 2
+    queryset = Product.objects.for_listing().filter(is_available=True)
+
+
+@method_decorator(catalog_http_caching, name='dispatch')
+class CategoryList(generics.ListAPIView):
+    """Categories with available products; small enough to return unpaginated."""
+    serializer_class = CategoryListingSerializer
+    pagination_class = None
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    query_budget = 2
+
+    def get_queryset(self):
+        return get_category_listing()
+
+
+# ---------------------------
+# Cart & orders
+# ---------------------------
+def cart_payload(user):
+    items = CartItem.objects.with_products().filter(cart__user=user).order_by('added_at', 'id')
+    summary = carts.get_cart_summary(user)
+    return {
+        'items': CartItemSerializer(items, many=True).data,
+        'summary': {'count': summary['count'], 'total': str(summary['total'])},
+    }
+
+
+class CartView(APIView):
+    """The user's cart; PATCH sets the quantities of many products at once (0 removes)."""
+    # PATCH is batched: the same count for any number of lines
+    query_budget = {'GET': 4, 'PATCH': 12}
+
+    def get(self, request):
+        return Response(cart_payload(request.user))
+
+    def patch(self, request):
+        serializer = CartUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        quantities = {item['product']: item['quantity'] for item in serializer.validated_data['items']}
+        try:
+            carts.set_quantities(request.user, quantities)
+        except carts.UnavailableProducts as e:
+            return Response(
+                {'detail': str(e), 'unavailable': e.product_ids},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(cart_payload(request.user))
+
+
+class OrderList(generics.ListCreateAPIView):
+    """The user's orders, newest first; POST ``{"shipping_address": ...}`` checks out the cart."""
+    serializer_class = OrderSerializer
+    pagination_class = NewestFirstPagination
+    # Checkout takes stock and updates the product's sales rollup per line
+    # (2 queries each) plus the rollup of each seller; POST covers carts of
+    # up to 5 lines from as many sellers
+    query_budget = {'GET': 4, 'POST': 28}
+
+    def get_queryset(self):
+        return Order.objects.with_items().filter(buyer=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            order = place_order(request.user, serializer.validated_data['shipping_address'].strip())
+        except OutOfStock as e:
+            return Response(
+                {'detail': str(e), 'product': e.product.pk},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except CheckoutError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        order = self.get_queryset().get(pk=order.pk)
+        return Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED)
+
+
+class OrderDetail(generics.RetrieveAPIView):
+    serializer_class = OrderSerializer
+    query_budget = 4
+
+    def get_queryset(self):
+        return Order.objects.with_items().filter(buyer=self.request.user)
@@ -1,32 +1,149 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, Http404, StreamingHttpResponse
 from django.contrib.auth import login, authenticate, logout, get_user_model
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils.text import slugify
-from django.db.models import Sum, F
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from django.views.decorators.http import require_POST
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
 import json
 
-from .forms import ProductForm, UserRegisterForm, SellerProfileForm, UserProfileForm
+from . import analytics, bulk, carts, metrics
+from .caching import cache_catalog_page
+from .catalog import acached_for_catalog, aget_category_listing, get_category_listing
+from .context_processors import async_context
+from .deals import aget_hot_deals
+from .forms import (
+    OrderFilterForm, ProductForm, ProductImportFileForm, UserRegisterForm, SellerProfileForm,
+    UserProfileForm,
+)
+from .metrics import query_budget
 from .models import Product, SellerProfile, Order, OrderItem, Cart, CartItem
+from .orders import CheckoutError, place_order
+from .pagination import encode_cursor, keyset_page
+from .recommendations import arelated_products
+from .search import SearchFilters, search_products
 
 User = get_user_model()
 
+# Products shown per category row on the landing page / per "load more" page
+CATEGORY_ROW_LIMIT = 8
+CATEGORY_PAGE_SIZE = 12
+# Orders per "My orders" page, and items listed per order before "and N more"
+ORDER_PAGE_SIZE = 10
+ORDER_ITEM_PREVIEW = 3
+
 # ---------------------------
 # Home & static pages
 # ---------------------------
-def index(request):
-    """Landing page showing all products + categories."""
-    products = Product.objects.filter(is_available=True)
-    types = products.values_list('product_type', flat=True).distinct()
-    types = sorted(set(t.title() for t in types if t))
-    return render(request, 'index.html', {'products': products, 'types': types})
-
-def hotdealpage(request):
-    """Hot deals page - could show discounted products."""
-    hot_products = Product.objects.filter(is_available=True)[:8]  # Show first 8 products as hot deals
-    return render(request, 'hotdeal.html', {'hot_products': hot_products})
+@query_budget(6)
+@cache_catalog_page
+async def index(request):
+    """Landing page showing the newest products of every category."""
+    return render(request, 'index.html', {
+        **await async_context(request),
+        'categories': await acached_for_catalog('index-rows', category_rows),
+        'category_listing': await aget_category_listing(),
+    })
+
+async def category_rows():
+    """The landing page rows: ``{'category', 'products', 'next_cursor'}`` dicts.
+
+    A single windowed query ranks products inside each category and keeps
+    only the first ``CATEGORY_ROW_LIMIT`` (+1 to detect whether a "load more"
+    link is needed), so the page cost doesn't grow with the catalog.
+    """
+    products = Product.objects.for_listing().filter(is_available=True).annotate(
+        category_rank=Window(
+            RowNumber(),
+            partition_by=[F('category_id')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        ),
+    ).filter(
+        category_rank__lte=CATEGORY_ROW_LIMIT + 1
+    ).order_by('category__name', 'category_id', 'category_rank')
+
+    categories = []
+    products = [product async for product in products]
+    for category_id, rows in groupby(products, key=lambda p: p.category_id):
+        rows = list(rows)
+        has_more = len(rows) > CATEGORY_ROW_LIMIT
+        rows = rows[:CATEGORY_ROW_LIMIT]
+        categories.append({
+            'category': rows[0].category,
+            'products': rows,
+            'next_cursor': encode_cursor(rows[-1]) if has_more else None,
+        })
+    return categories
+
+@query_budget(6)
+@cache_catalog_page
+def category_products(request, slug):
+    """One category, newest first, paginated with a keyset cursor.
+
+    AJAX requests ("load more" on the landing page) get only the card
+    fragment; normal requests get the full category page.
+    """
+    category = next((c for c in get_category_listing() if c.slug == slug), None)
+    if category is None:
+        raise Http404("No such category.")
+
+    products = Product.objects.for_listing().filter(is_available=True, category=category)
+    page, next_cursor = keyset_page(products, request.GET.get('after'), CATEGORY_PAGE_SIZE)
+    context = {
+        'category': category,
+        'products': page,
+        'next_cursor': next_cursor,
+    }
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return render(request, 'product_cards.html', context)
+    return render(request, 'category.html', context)
+
+@query_budget(8)
+def search(request):
+    """Full-text product search with category/price filters."""
+    category_slug = request.GET.get('category', '')
+    category = next((c for c in get_category_listing() if c.slug == category_slug), None)
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+
+    filters = SearchFilters(category_id=category.pk if category else None)
+    for bound in ('min_price', 'max_price'):
+        try:
+            value = Decimal(request.GET[bound])
+        except (KeyError, InvalidOperation):
+            continue
+        # NaN and Infinity parse but can't be compared or formatted
+        if value.is_finite():
+            setattr(filters, bound, value)
+
+    query = request.GET.get('q', '').strip()
+    results = search_products(query, filters, page=page)
+    page_params = request.GET.copy()
+    page_params.pop('page', None)
+    return render(request, 'search.html', {
+        'query': query,
+        'page_params': page_params.urlencode(),
+        'results': results,
+        'selected_category': category,
+        'filters': filters,
+        'category_listing': get_category_listing(),
+    })
+
+@query_budget(5)
+@cache_catalog_page
+async def hotdealpage(request):
+    """Hot deals page, read from the list built by ``manage.py refresh_hot_deals``."""
+    return render(request, 'hotdeal.html', {
+        **await async_context(request),
+        'hot_deals': await aget_hot_deals(),
+    })
 
 def support(request):
     return render(request, 'support.html')
@@ -34,65 +151,73 @@ def support(request):
 # ---------------------------
 # Cart functionality
 # ---------------------------
+@query_budget(5)
 @login_required
 def cart(request):
     """Display user's cart."""
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items = CartItem.objects.filter(cart=cart)
-    total = sum(item.get_total_price() for item in cart_items)
+    cart_items = CartItem.objects.with_products().filter(cart__user=request.user)
     return render(request, 'cart.html', {
         'cart_items': cart_items,
-        'total': total
+        'total': carts.get_cart_summary(request.user)['total'],
     })
 
+# The buyer's first add also creates the cart
+@query_budget(POST=10)
 @login_required
 @require_POST
-def add_to_cart(request, product_id):
-    """Add product to cart via AJAX."""
+async def add_to_cart(request, product_id):
+    """Add product to cart via AJAX; returns the new cart unit count."""
     try:
-        product = get_object_or_404(Product, id=product_id, is_available=True)
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': 1}
+        quantity = int(request.POST.get('quantity', 1))
+    except (TypeError, ValueError):
+        quantity = 0
+    if not 1 <= quantity <= carts.MAX_CART_QUANTITY:
+        return JsonResponse(
+            {'success': False, 'message': f'Quantity must be a whole number from 1 to {carts.MAX_CART_QUANTITY}.'},
+            status=400,
         )
-        
-        if not created:
-            cart_item.quantity += 1
-            cart_item.save()
-        
-        return JsonResponse({'success': True, 'message': 'Product added to cart'})
-    except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)})
+
+    try:
+        cart_count = await carts.aadd_item(await request.auser(), product_id, quantity)
+    except Product.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'This product is not available.'}, status=404)
+    return JsonResponse({
+        'success': True,
+        'message': 'Product added to cart',
+        'cart_count': cart_count,
+    })
 
 @login_required
 def remove_from_cart(request, item_id):
     """Remove item from cart."""
     cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
     cart_item.delete()
+    carts.invalidate_cart_summary(request.user.pk)
     messages.success(request, 'Item removed from cart.')
     return redirect('cart')
 
 # ---------------------------
 # User Dashboard & Profile
 # ---------------------------
+@query_budget(5)
 @login_required
 def buyer_dashboard(request):
     """Buyer dashboard with orders and profile management."""
     if request.user.role != 'buyer':
         return redirect('seller_dashboard')
     
-    recent_orders = Order.objects.filter(buyer=request.user)[:5]
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items_count = CartItem.objects.filter(cart=cart).count()
+    orders = Order.objects.filter(buyer=request.user)
+    recent_orders = orders.order_by('-created_at', '-id')[:5]
+    cart_items_count = carts.get_cart_summary(request.user)['count']
     
     return render(request, 'buyer_dashboard.html', {
         'recent_orders': recent_orders,
+        'order_count': orders.count(),
         'cart_items_count': cart_items_count,
     })
 
+# A cold session and user, or the session flush after a password change
+@query_budget(3)
 @login_required
 def account(request):
     """User account page - redirects to appropriate dashboard."""
@@ -115,11 +240,38 @@ def edit_profile(request):
     
     return render(request, 'edit_profile.html', {'form': form})
 
+@query_budget(5)
 @login_required
 def my_orders(request):
-    """Display user's orders."""
-    orders = Order.objects.filter(buyer=request.user)
-    return render(request, 'my_orders.html', {'orders': orders})
+    """The user's orders, newest first, filterable by status and date.
+
+    Pages are keyset-paginated on ``(created_at, id)`` and each order only
+    loads a short item preview plus counts, so the cost of a page doesn't
+    depend on how many orders (or items) the buyer has.
+    """
+    filters = OrderFilterForm(request.GET)
+    orders = filters.filter(Order.objects.filter(buyer=request.user))
+    page, next_cursor = keyset_page(
+        orders.with_summary(ORDER_ITEM_PREVIEW), request.GET.get('after'), ORDER_PAGE_SIZE,
+    )
+    for order in page:
+        order.more_items = order.item_count - len(order.preview_items)
+
+    # Links keep the filters and only move the cursor
+    query = request.GET.copy()
+    first_page_query = None
+    if query.pop('after', None):
+        first_page_query = query.urlencode()
+    next_page_query = None
+    if next_cursor:
+        query['after'] = next_cursor
+        next_page_query = query.urlencode()
+    return render(request, 'my_orders.html', {
+        'orders': page,
+        'filters': filters,
+        'first_page_query': first_page_query,
+        'next_page_query': next_page_query,
+    })
 
 # ---------------------------
 # Helpers
@@ -256,6 +408,7 @@ def user_logout(request):
 # ---------------------------
 # Seller Dashboard & Management
 # ---------------------------
+@query_budget(9)
 @login_required
 def seller_dashboard(request):
     """Seller dashboard with products and analytics."""
@@ -270,21 +423,21 @@ def seller_dashboard(request):
         messages.error(request, "Seller profile not found. Please contact support.")
         return redirect('index')
 
-    products = Product.objects.filter(seller=request.user)
-    total_products = products.count()
-    total_quantity = products.aggregate(Sum('quantity'))['quantity__sum'] or 0
-    total_value = sum(p.price * p.quantity for p in products)
-    
+    products = Product.objects.filter(seller=request.user).select_related('category')[:5]
+    daily_sales = analytics.sales_by_day(request.user)
+
     # Recent orders for seller's products
     recent_orders = OrderItem.objects.filter(
         product__seller=request.user
-    ).select_related('order', 'product')[:10]
+    ).select_related('order__buyer', 'product').order_by('-order__created_at')[:5]
 
     return render(request, 'seller_dashboard.html', {
         'products': products,
-        'total_products': total_products,
-        'total_quantity': total_quantity,
-        'total_value': total_value,
+        **analytics.inventory_summary(request.user),
+        'daily_sales': daily_sales,
+        'sales': analytics.sales_totals(daily_sales),
+        'top_products': analytics.top_products(request.user),
+        'sales_window_days': analytics.SALES_WINDOW_DAYS,
         'recent_orders': recent_orders,
         'seller_profile': seller_profile,
     })
@@ -302,9 +455,8 @@ def addproduct(request):
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES)
         if form.is_valid():
-            product = form.save(commit=False)
-            product.seller = request.user
-            product.save()
+            form.instance.seller = request.user
+            product = form.save()
             messages.success(request, f'Product "{product.name}" added successfully!')
             return redirect('seller_dashboard')
     else:
@@ -312,6 +464,7 @@ def addproduct(request):
     
     return render(request, 'addproduct.html', {'form': form})
 
+@query_budget(5)
 @login_required
 def showproduct(request):
     """Show seller's products."""
@@ -320,13 +473,10 @@ def showproduct(request):
         return redirect('index')
 
     products = Product.objects.filter(seller=request.user)
-    total_quantity = products.aggregate(Sum('quantity'))['quantity__sum'] or 0
-    total_value = sum(p.price * p.quantity for p in products)
-    
+
     return render(request, 'showproduct.html', {
         'products': products,
-        'total_quantity': total_quantity,
-        'total_value': total_value
+        **analytics.inventory_summary(request.user),
     })
 
 @login_required
@@ -366,80 +516,109 @@ def deleteproduct(request, product_id):
     
     return render(request, 'deleteproduct.html', {'product': product})
 
+@login_required
+def import_products(request):
+    """Create or update many products from an uploaded CSV / JSON Lines file (seller only)."""
+    if request.user.role != 'seller':
+        messages.error(request, "Only sellers can import products.")
+        return redirect('index')
+
+    result = None
+    if request.method == 'POST':
+        form = ProductImportFileForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = bulk.import_products(request.user, upload, bulk.guess_format(upload.name))
+            except bulk.ImportFileError as e:
+                form.add_error('file', str(e))
+            else:
+                messages.success(
+                    request,
+                    f'Imported {result.created} new and {result.updated} updated products.',
+                )
+    else:
+        form = ProductImportFileForm()
+
+    return render(request, 'importproducts.html', {
+        'form': form,
+        'result': result,
+        'columns': bulk.COLUMNS,
+    })
+
+@login_required
+def export_products(request):
+    """Download all of the seller's products as CSV (or ``?format=jsonl``)."""
+    if request.user.role != 'seller':
+        messages.error(request, "Access denied.")
+        return redirect('index')
+
+    if request.GET.get('format') == 'jsonl':
+        response = StreamingHttpResponse(bulk.export_jsonl(request.user), content_type='application/x-ndjson')
+        filename = 'products.jsonl'
+    else:
+        response = StreamingHttpResponse(bulk.export_csv(request.user), content_type='text/csv; charset=utf-8')
+        filename = 'products.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 # ---------------------------
 # Product Detail & Purchase
 # ---------------------------
-def product_detail(request, product_id):
+@query_budget(7)
+@cache_catalog_page(stock_of='product_id')
+async def product_detail(request, product_id):
     """Product detail page."""
-    product = get_object_or_404(Product, id=product_id, is_available=True)
-    related_products = Product.objects.filter(
-        product_type=product.product_type,
-        is_available=True
-    ).exclude(id=product.id)[:4]
-    
+    try:
+        product = await Product.objects.for_listing().aget(id=product_id, is_available=True)
+    except Product.DoesNotExist:
+        raise Http404("No such product.")
     return render(request, 'product_detail.html', {
+        **await async_context(request),
         'product': product,
-        'related_products': related_products
+        'related_products': await arelated_products(product),
     })
 
 # ---------------------------
 # Order Management
 # ---------------------------
+# Two queries per cart line and one per seller, like the API checkout;
+# covers 5 lines from as many sellers
+@query_budget(POST=26)
 @login_required
 def create_order(request):
     """Create order from cart."""
     if request.method == 'POST':
         try:
-            cart = Cart.objects.get(user=request.user)
-            cart_items = CartItem.objects.filter(cart=cart)
-            
-            if not cart_items.exists():
-                messages.error(request, 'Your cart is empty.')
-                return redirect('cart')
-            
-            # Calculate total
-            total_amount = sum(item.get_total_price() for item in cart_items)
-            
-            # Get shipping address from form
-            shipping_address = request.POST.get('shipping_address', '')
-            if not shipping_address:
-                messages.error(request, 'Shipping address is required.')
-                return redirect('cart')
-            
-            # Create order
-            order = Order.objects.create(
-                buyer=request.user,
-                total_amount=total_amount,
-                shipping_address=shipping_address
+            order = place_order(
+                request.user,
+                request.POST.get('shipping_address', '').strip(),
             )
-            
-            # Create order items
-            for cart_item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    quantity=cart_item.quantity,
-                    price=cart_item.product.price
-                )
-                
-                # Update product quantity
-                product = cart_item.product
-                if product.quantity >= cart_item.quantity:
-                    product.quantity -= cart_item.quantity
-                    product.save()
-            
-            # Clear cart
-            cart_items.delete()
-            
-            messages.success(request, f'Order #{order.id} placed successfully!')
-            return redirect('my_orders')
-            
+        except CheckoutError as e:
+            messages.error(request, str(e))
+            return redirect('cart')
         except Exception as e:
             messages.error(request, f'Error creating order: {str(e)}')
             return redirect('cart')
-    
+
+        messages.success(request, f'Order #{order.id} placed successfully!')
+        return redirect('my_orders')
+
     return redirect('cart')
 
+# ---------------------------
+# Performance (staff only)
+# ---------------------------
+@staff_member_required
+def perf(request):
+    """Recent per-request query counts and timings from ``metrics.RequestMetricsMiddleware``."""
+    requests = metrics.recent_requests()
+    return render(request, 'perf.html', {
+        'views': metrics.view_summary(requests),
+        'requests': requests[:100],
+        'buffer_size': metrics.METRICS_BUFFER_SIZE,
+    })
+
 # ---------------------------
 # Helpers
 # ---------------------------
@@ -0,0 +1,86 @@
+"""Authentication backend that serves the logged-in user from the cache.
+
+Django loads ``request.user`` on every authenticated request with a query
+for the user, and the role-routing views then look up
+``request.user.sellerprofile`` with another. ``CachedModelBackend`` keeps
+the user, with the seller profile already attached, in the cache for
+``USER_CACHE_TIMEOUT`` seconds. Django's own session checks (including the
+password-change session hash) still run on the cached object.
+
+Saving or deleting a user or seller profile drops the cached copy (see
+``signals.py``); the short timeout bounds staleness from ``update()``
+calls, which send no signals. Logging out drops it too.
+
+That invalidation only reaches other workers through a shared cache, so
+``check_shared_cache`` refuses this backend and cache-backed sessions on a
+per-process one (local memory, dummy).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core import checks
+from django.core.cache import cache
+
+USER_CACHE_TIMEOUT = 300
+PER_PROCESS_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+CACHED_SESSION_ENGINES = {
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+}
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def _users():
+    return get_user_model()._default_manager.select_related('sellerprofile')
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = _users().filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await _users().filter(pk=user_id).afirst()
+            if user is None:
+                return None
+            await cache.aset(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs=None, **kwargs):
+    if settings.CACHES['default']['BACKEND'] not in PER_PROCESS_CACHES:
+        return []
+    uses_cache = [
+        name for name, enabled in (
+            ('AUTHENTICATION_BACKENDS', f'{__name__}.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS),
+            ('SESSION_ENGINE', settings.SESSION_ENGINE in CACHED_SESSION_ENGINES),
+        ) if enabled
+    ]
+    if not uses_cache:
+        return []
+    return [checks.Error(
+        f"{' and '.join(uses_cache)} keep users or sessions in a per-process cache, so "
+        "logging out or changing a password would not reach the other workers.",
+        hint="Set CACHE_URL to a shared cache, or use ModelBackend and database sessions.",
+        id='newapp.E001',
+    )]
@@ -0,0 +1,248 @@
+"""Bulk product import and export for sellers.
+
+Imports read CSV or JSON Lines (one object per line) as a stream, validate
+every row with ``ProductImportForm`` (the ``ProductForm`` rules) and write
+the valid ones ``IMPORT_CHUNK_SIZE`` at a time with ``bulk_create`` /
+``bulk_update``, one transaction per chunk, so memory use depends on the
+chunk size and not on the file. A row whose ``id`` is one of the seller's
+products updates it; a row without an ``id`` creates a product. Invalid
+rows are skipped and reported by line number.
+
+Bulk writes don't send model signals, so each chunk does the work of
+``signals.py`` itself (price history, search index, image-variant tasks)
+and the catalog version is bumped once at the end.
+
+Exports stream the same columns, so a seller can export, edit and re-import.
+"""
+import csv
+import io
+import json
+import os
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import search
+from .catalog import bump_catalog_version
+from .forms import ProductImportForm
+from .images import needs_processing, process_product_image
+from .models import PriceHistory, Product
+
+COLUMNS = [
+    'id', 'name', 'description', 'price', 'compare_at_price', 'quantity',
+    'category', 'image', 'return_policy', 'is_available',
+]
+REQUIRED_COLUMNS = {'name', 'price', 'quantity', 'category', 'image', 'return_policy'}
+UPDATE_FIELDS = [
+    'name', 'description', 'price', 'compare_at_price', 'quantity',
+    'category', 'image', 'return_policy', 'is_available', 'updated_at',
+]
+FORMATS = ('csv', 'jsonl')
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+class ImportFileError(ValueError):
+    """The file as a whole can't be imported; the message is safe to show."""
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    error_count: int = 0
+    # (line number, message) for the first MAX_REPORTED_ERRORS bad rows
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def guess_format(filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    return 'jsonl' if extension in ('.jsonl', '.ndjson') else 'csv'
+
+
+# ---------------------------
+# Import
+# ---------------------------
+def import_products(seller, stream, file_format='csv', chunk_size=IMPORT_CHUNK_SIZE):
+    """Create/update ``seller``'s products from a binary ``stream``; returns ``ImportResult``."""
+    if file_format not in FORMATS:
+        raise ImportFileError(f"Unknown format {file_format!r}; use one of {', '.join(FORMATS)}.")
+    result = ImportResult()
+    categories = {}
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        rows = read_rows(text, file_format)
+        while chunk := list(islice(rows, chunk_size)):
+            _import_chunk(seller, chunk, categories, result)
+    except UnicodeDecodeError:
+        raise ImportFileError("The file is not UTF-8 text.") from None
+    finally:
+        # Leave the caller's stream open
+        text.detach()
+    if result.created or result.updated:
+        search.reset_inverted_index()
+        bump_catalog_version()
+    return result
+
+
+def read_rows(text, file_format):
+    """Yield ``(line number, row)``; ``row`` is a dict, or ``None`` for a malformed line."""
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        missing = REQUIRED_COLUMNS - set(reader.fieldnames or ())
+        if missing:
+            raise ImportFileError(f"Missing columns: {', '.join(sorted(missing))}.")
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def form_data(row):
+    """Row values as form data; a missing or blank ``is_available`` means available."""
+    data = {
+        column: '' if row.get(column) is None else row[column]
+        for column in COLUMNS if column in row
+    }
+    if data.get('is_available', '') == '':
+        data['is_available'] = True
+    return data
+
+
+def _import_chunk(seller, chunk, categories, result):
+    ids = {str(row.get('id') or '').strip() for _, row in chunk if row}
+    existing = (
+        Product.objects.filter(seller=seller).select_related('category')
+        .in_bulk([int(pk) for pk in ids if pk.isdigit()])
+    )
+
+    valid = []
+    for line, row in chunk:
+        if row is None:
+            result.add_error(line, "Not a JSON object.")
+            continue
+        pk = str(row.get('id') or '').strip()
+        instance = None
+        if pk:
+            instance = existing.get(int(pk)) if pk.isdigit() else None
+            if instance is None:
+                result.add_error(line, f"You have no product with id {pk}.")
+                continue
+        form = ProductImportForm(form_data(row), instance=instance, categories=categories)
+        if not form.is_valid():
+            result.add_error(line, _describe_errors(form))
+            continue
+        if instance is None:
+            form.instance.seller = seller
+        valid.append(form)
+
+    now = timezone.now()
+    with transaction.atomic():
+        # New categories are created here, with the products that use them
+        to_create, to_update = [], []
+        for form in valid:
+            product = form.save(commit=False)
+            if product.pk is None:
+                to_create.append(product)
+            else:
+                # bulk_update() doesn't apply auto_now
+                product.updated_at = now
+                to_update.append(product)
+        Product.objects.bulk_create(to_create)
+        Product.objects.bulk_update(to_update, UPDATE_FIELDS)
+        # Backends that can't return ids from a bulk insert (MySQL) leave new
+        # products without a pk here; process_product_images picks their
+        # images up later.
+        written = [product for product in to_create + to_update if product.pk]
+        PriceHistory.objects.bulk_create([
+            PriceHistory(product=product, price=product.price)
+            for product in written if product.price_changed
+        ])
+        process_product_image.enqueue_many([
+            {'product_id': product.pk}
+            for product in written if product.image_changed and needs_processing(product)
+        ])
+        search.fts_index_products([product.pk for product in written])
+
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def _describe_errors(form):
+    return '; '.join(
+        ' '.join(errors) if name == '__all__' else f"{name}: {' '.join(errors)}"
+        for name, errors in form.errors.items()
+    )
+
+
+# ---------------------------
+# Export
+# ---------------------------
+def export_rows(seller):
+    """The seller's products as tuples in ``COLUMNS`` order, streamed from the database."""
+    return (
+        Product.objects.filter(seller=seller).order_by('id')
+        .values_list(
+            'id', 'name', 'description', 'price', 'compare_at_price', 'quantity',
+            'category__name', 'image', 'return_policy', 'is_available',
+        )
+        .iterator(chunk_size=2000)
+    )
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the text, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(seller):
+    writer = csv.writer(_Echo())
+    lines = (
+        writer.writerow([_csv_value(value) for value in row]) for row in export_rows(seller)
+    )
+    return _buffered(writer.writerow(COLUMNS), lines)
+
+
+def export_jsonl(seller):
+    lines = (
+        json.dumps(dict(zip(COLUMNS, row)), default=str) + '\n' for row in export_rows(seller)
+    )
+    return _buffered('', lines)
+
+
+def _csv_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+def _buffered(first, lines, size=EXPORT_BUFFER_SIZE):
+    """Join lines into chunks of about ``size`` characters (one write per chunk, not per row)."""
+    buffer = [first]
+    length = len(first)
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,146 @@
+"""Whole-page caching for anonymous catalog views.
+
+Anonymous visitors all see the same catalog pages, so ``cache_catalog_page``
+stores the rendered HTML under the current catalog version (see
+``catalog.py``) and answers repeat requests straight from the cache. The
+version doubles as the page's ETag and Last-Modified, so browsers and
+proxies that revalidate get a bodiless 304.
+
+Pages that show a product's stock level are also keyed by that product's
+stock version (``cache_catalog_page(stock_of='product_id')``), so a
+checkout refreshes them without dropping the rest of the catalog.
+
+Logged-in users, non-GET requests and responses that carry per-visitor state
+(flash messages, a CSRF token) are never cached. Works for sync and async
+views alike.
+"""
+import hashlib
+from functools import partial, wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .catalog import (
+    CATALOG_CACHE_TIMEOUT, aget_catalog_version, aget_stock_version, get_catalog_version,
+    get_stock_version,
+)
+from .context_processors import async_context
+
+PAGE_CACHE_TIMEOUT = CATALOG_CACHE_TIMEOUT
+
+
+def _cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
+
+def _page_version(catalog_version, stock_version=0):
+    """``(tag, last_modified)``: the ETag / cache key part and Last-Modified seconds."""
+    tag = f'{catalog_version}-{stock_version}' if stock_version else f'{catalog_version}'
+    return tag, max(catalog_version, stock_version) // 1000
+
+
+def _page_key(request, version):
+    # Views may answer XHRs with a fragment (see _set_validators' Vary), so
+    # the two never share an entry
+    variant = 'xhr' if request.headers.get('x-requested-with') == 'XMLHttpRequest' else 'page'
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'catalog:{version[0]}:{variant}:{path}'
+
+
+def _set_validators(response, version):
+    tag, last_modified = version
+    response['ETag'] = f'"catalog-{tag}"'
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ['Cookie', 'X-Requested-With'])
+    return response
+
+
+def _cacheable_response(request, response):
+    return response.status_code == 200 and not response.streaming and not (
+        request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or response.cookies
+    )
+
+
+def _not_modified(request, version):
+    tag, last_modified = version
+    response = get_conditional_response(request, etag=f'"catalog-{tag}"', last_modified=last_modified)
+    return _set_validators(response, version) if response is not None else None
+
+
+def _from_cache(cached, version):
+    content, content_type = cached
+    return _set_validators(HttpResponse(content, content_type=content_type), version)
+
+
+def cache_catalog_page(view=None, *, stock_of=None):
+    """Serve ``view`` from the page cache for anonymous visitors.
+
+    ``stock_of`` names the URL argument holding the id of a product whose
+    stock the page shows.
+    """
+    if view is None:
+        return partial(cache_catalog_page, stock_of=stock_of)
+    if iscoroutinefunction(view):
+        return _cache_async_catalog_page(view, stock_of)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        version = _page_version(
+            get_catalog_version(), get_stock_version(kwargs[stock_of]) if stock_of else 0,
+        )
+        not_modified = _not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+
+        key = _page_key(request, version)
+        cached = cache.get(key)
+        if cached is not None:
+            return _from_cache(cached, version)
+
+        response = view(request, *args, **kwargs)
+        if _cacheable_response(request, response):
+            cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+            _set_validators(response, version)
+        return response
+    return wrapper
+
+
+def _cache_async_catalog_page(view, stock_of):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            # Loads the user and session so the check below needs no queries
+            await async_context(request)
+        if not _cacheable_request(request):
+            return await view(request, *args, **kwargs)
+
+        version = _page_version(
+            await aget_catalog_version(), await aget_stock_version(kwargs[stock_of]) if stock_of else 0,
+        )
+        not_modified = _not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+
+        key = _page_key(request, version)
+        cached = await cache.aget(key)
+        if cached is not None:
+            return _from_cache(cached, version)
+
+        response = await view(request, *args, **kwargs)
+        if _cacheable_response(request, response):
+            await cache.aset(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+            _set_validators(response, version)
+        return response
+    return wrapper
@@ -0,0 +1,134 @@
+"""Cart mutations and the cached cart summary shown in the navbar badge."""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Least
+
+from .models import Cart, CartItem, Product
+
+# Price edits don't invalidate carts, so keep the cached total short-lived
+CART_SUMMARY_TIMEOUT = 60 * 5
+# Most units of one product a cart line can hold
+MAX_CART_QUANTITY = 999
+
+SUMMARY_AGGREGATES = {
+    'count': Sum('quantity'),
+    'total': Sum(
+        F('quantity') * F('product__price'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    ),
+}
+
+
+def _summary(totals):
+    return {
+        'count': totals['count'] or 0,
+        'total': (totals['total'] or Decimal('0')).quantize(Decimal('0.01')),
+    }
+
+
+def _summary_key(user_id):
+    return f'cart:summary:{user_id}'
+
+
+def get_cart_summary(user):
+    """Return ``{'count': units, 'total': Decimal}`` for ``user``'s cart.
+
+    Computed with one aggregate query and cached per user until the cart
+    changes (``invalidate_cart_summary``).
+    """
+    key = _summary_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = _summary(CartItem.objects.filter(cart__user=user).aggregate(**SUMMARY_AGGREGATES))
+        cache.set(key, summary, CART_SUMMARY_TIMEOUT)
+    return summary
+
+
+async def aget_cart_summary(user):
+    """Async ``get_cart_summary``."""
+    key = _summary_key(user.pk)
+    summary = await cache.aget(key)
+    if summary is None:
+        summary = _summary(await CartItem.objects.filter(cart__user=user).aaggregate(**SUMMARY_AGGREGATES))
+        await cache.aset(key, summary, CART_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_cart_summary(user_id):
+    cache.delete(_summary_key(user_id))
+
+
+async def ainvalidate_cart_summary(user_id):
+    await cache.adelete(_summary_key(user_id))
+
+
+async def aadd_item(user, product_id, quantity=1):
+    """Add ``quantity`` units of a product to ``user``'s cart.
+
+    The quantity is bumped with ``UPDATE ... SET quantity = quantity + n`` so
+    double-clicks can't lose an increment, capped at ``MAX_CART_QUANTITY``;
+    a new line is only inserted when none exists yet, and a racing insert
+    falls back to the increment. Async code runs in autocommit mode, so that
+    insert needs no savepoint: the failed INSERT is its own statement.
+    Raises ``Product.DoesNotExist`` if the product doesn't exist or isn't
+    available. Returns the number of units now in the cart.
+    """
+    cart, created = await Cart.objects.aget_or_create(user=user)
+    if not await _aincrement(cart, product_id, quantity):
+        if not await Product.objects.filter(pk=product_id, is_available=True).aexists():
+            raise Product.DoesNotExist('This product is not available.')
+        try:
+            await CartItem.objects.acreate(cart=cart, product_id=product_id, quantity=quantity)
+        except IntegrityError:
+            await _aincrement(cart, product_id, quantity)
+    await ainvalidate_cart_summary(user.pk)
+    return (await aget_cart_summary(user))['count']
+
+
+class UnavailableProducts(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f'These products are not available: {self.product_ids}')
+
+
+def set_quantities(user, quantities):
+    """Set many cart lines at once from ``{product_id: quantity}``; 0 removes a line.
+
+    Runs in one transaction with one DELETE and one bulk upsert
+    (``INSERT ... ON CONFLICT DO UPDATE``), whatever the number of lines.
+    Raises ``UnavailableProducts`` (and changes nothing) if any product to
+    keep doesn't exist or isn't available. Returns the new cart summary.
+    """
+    keep = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    remove = [pk for pk, quantity in quantities.items() if quantity <= 0]
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        available = set(
+            Product.objects.filter(pk__in=keep, is_available=True).values_list('pk', flat=True)
+        )
+        if len(available) < len(keep):
+            raise UnavailableProducts(set(keep) - available)
+        if remove:
+            CartItem.objects.filter(cart=cart, product_id__in=remove).delete()
+        if keep:
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, product_id=pk, quantity=quantity) for pk, quantity in keep.items()],
+                update_conflicts=True,
+                # MySQL upserts on any unique key and refuses an explicit target
+                unique_fields=(
+                    ['cart', 'product'] if connection.features.supports_update_conflicts_with_target else None
+                ),
+                update_fields=['quantity'],
+            )
+    invalidate_cart_summary(user.pk)
+    return get_cart_summary(user)
+
+
+async def _aincrement(cart, product_id, quantity):
+    # Lines of products that became unavailable stay as they are
+    return await CartItem.objects.filter(
+        cart=cart, product_id=product_id, product__is_available=True,
+    ).aupdate(quantity=Least(F('quantity') + quantity, MAX_CART_QUANTITY))
@@ -0,0 +1,100 @@
+"""Cached, read-mostly views of the product catalog.
+
+Everything cached here is keyed by the *catalog version*: a millisecond
+timestamp bumped (``bump_catalog_version``) whenever a product or category
+changes. Old entries are never deleted explicitly, they just stop being
+looked up and expire.
+
+Checkouts only change stock levels, which just the product page and the API
+show, so they bump *stock versions* instead (``bump_stock_versions``): one
+per product, plus one for the whole catalog's stock. Listings, the landing
+page and the search index stay cached through order traffic.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+
+from .models import Category, Product
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+
+def get_catalog_version():
+    """Current catalog version (milliseconds since the epoch of the last change)."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Cold cache: start from the newest product edit so that
+        # Last-Modified stays stable across restarts.
+        last_edit = Product.objects.aggregate(last=Max('updated_at'))['last']
+        version = int((last_edit.timestamp() if last_edit else time.time()) * 1000)
+        cache.add(CATALOG_VERSION_KEY, version, None)
+        version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+async def aget_catalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        version = await sync_to_async(get_catalog_version)()
+    return version
+
+
+def bump_catalog_version():
+    version = max(int(time.time() * 1000), (cache.get(CATALOG_VERSION_KEY) or 0) + 1)
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def stock_version_key(product_id=None):
+    return f'stock:version:{product_id}' if product_id is not None else 'stock:version'
+
+
+def bump_stock_versions(product_ids):
+    """Mark the stock of ``product_ids`` (and so the catalog's stock) as changed."""
+    version = int(time.time() * 1000)
+    keys = [stock_version_key()] + [stock_version_key(pk) for pk in product_ids]
+    cache.set_many({key: version for key in keys}, None)
+
+
+def get_stock_version(product_id=None):
+    """When the stock of a product (or of any product) last changed through an order; 0 if unknown."""
+    return cache.get(stock_version_key(product_id), 0)
+
+
+async def aget_stock_version(product_id=None):
+    return await cache.aget(stock_version_key(product_id), 0)
+
+
+def cached_for_catalog(name, build, timeout=CATALOG_CACHE_TIMEOUT):
+    """Return ``build()``, cached under ``name`` until the catalog changes."""
+    return cache.get_or_set(f'catalog:{get_catalog_version()}:{name}', build, timeout)
+
+
+async def acached_for_catalog(name, abuild, timeout=CATALOG_CACHE_TIMEOUT):
+    """Async ``cached_for_catalog``; ``abuild`` is a coroutine function."""
+    key = f'catalog:{await aget_catalog_version()}:{name}'
+    value = await cache.aget(key)
+    if value is None:
+        value = await abuild()
+        await cache.aset(key, value, timeout)
+    return value
+
+
+def _category_listing():
+    return Category.objects.annotate(
+        product_count=Count('products', filter=Q(products__is_available=True))
+    ).filter(product_count__gt=0)
+
+
+def get_category_listing():
+    """Categories that have available products, with their product counts."""
+    return cached_for_catalog('category-listing', lambda: list(_category_listing()))
+
+
+async def aget_category_listing():
+    async def build():
+        return [category async for category in _category_listing()]
+    return await acached_for_catalog('category-listing', build)
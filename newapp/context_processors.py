@@ -0,0 +1,44 @@
+from django.utils.functional import SimpleLazyObject
+
+from .carts import aget_cart_summary, get_cart_summary
+from .catalog import aget_catalog_version, get_catalog_version
+
+
+def cart_summary(request):
+    """Expose ``cart_summary`` (``count``/``total``) for the navbar cart badge.
+
+    Lazy, so pages that don't render the badge never touch the cache.
+    """
+    def summary():
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return None
+        return get_cart_summary(user)
+
+    return {'cart_summary': SimpleLazyObject(summary)}
+
+
+def catalog_version(request):
+    """Expose ``catalog_version`` for ``{% cache %}`` fragment keys."""
+    return {'catalog_version': SimpleLazyObject(get_catalog_version)}
+
+
+async def async_context(request):
+    """Resolve everything the base template would load lazily, for async views.
+
+    The database can't be used synchronously from an async view, so the
+    user, the session (read by the messages framework) and the values of
+    the processors above are loaded here with async queries. Pass the
+    result into the template context; it takes precedence over the lazy
+    processor values and makes ``render`` database-free.
+    """
+    if not hasattr(request, '_async_context'):
+        request.user = await request.auser()
+        await request.session.akeys()  # fills the session cache
+        request._async_context = {
+            'cart_summary': (
+                await aget_cart_summary(request.user) if request.user.is_authenticated else None
+            ),
+            'catalog_version': await aget_catalog_version(),
+        }
+    return request._async_context
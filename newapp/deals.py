@@ -0,0 +1,120 @@
+"""Hot deals: scoring products and materializing the top-N list.
+
+``refresh_hot_deals`` (run periodically via ``manage.py refresh_hot_deals``)
+scores every candidate product and rewrites the HotDeal table;
+``aget_hot_deals`` is what the hot-deals page reads, one cached list per
+catalog version.
+
+A product's score mixes three signals, each scaled to 0..1:
+
+* discount -- how far ``price`` is below the reference price, which is the
+  higher of ``compare_at_price`` and the highest price in the last
+  ``DEAL_WINDOW_DAYS`` days of PriceHistory;
+* sales velocity -- units sold per day over the window (from the
+  ProductDailySales rollup), log-scaled against the fastest seller;
+* stock -- a deal that is about to sell out is worth less than one with
+  ``STOCK_COMFORT`` units or more left.
+"""
+import heapq
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from .catalog import acached_for_catalog, bump_catalog_version
+from .models import HotDeal, PriceHistory, Product, ProductDailySales
+
+HOT_DEALS_LIMIT = 24
+DEAL_WINDOW_DAYS = 30
+STOCK_COMFORT = 10
+
+DISCOUNT_WEIGHT = 0.6
+VELOCITY_WEIGHT = 0.25
+STOCK_WEIGHT = 0.15
+
+
+def _hot_deals():
+    return HotDeal.objects.select_related(
+        'product__category', 'product__seller__sellerprofile'
+    ).filter(product__is_available=True)
+
+
+async def aget_hot_deals():
+    """The materialized hot deals, best first, with their products joined in."""
+    async def build():
+        return [deal async for deal in _hot_deals()]
+    return await acached_for_catalog('hot-deals', build)
+
+
+def deal_candidates(window_days=DEAL_WINDOW_DAYS):
+    """In-stock products that are discounted or have sold within the window.
+
+    Yields ``(id, price, quantity, reference_price, units_sold)``.
+    """
+    since = timezone.now() - timedelta(days=window_days)
+    recent_high = PriceHistory.objects.filter(
+        product=OuterRef('pk'), changed_at__gte=since,
+    ).order_by().values('product').annotate(high=Max('price')).values('high')
+    units_sold = ProductDailySales.objects.filter(
+        product=OuterRef('pk'), day__gte=since.date(),
+    ).order_by().values('product').annotate(units=Sum('units')).values('units')
+
+    rows = Product.objects.filter(is_available=True, quantity__gt=0).annotate(
+        recent_high=Subquery(recent_high),
+        units_sold=Subquery(units_sold),
+    ).filter(
+        Q(compare_at_price__gt=F('price'))
+        | Q(recent_high__gt=F('price'))
+        | Q(units_sold__gt=0)
+    ).values_list('id', 'price', 'quantity', 'compare_at_price', 'recent_high', 'units_sold')
+
+    for pk, price, quantity, compare_at, recent_high, units in rows.iterator():
+        reference = max((p for p in (compare_at, recent_high) if p), default=price)
+        yield pk, price, quantity, max(reference, price), units or 0
+
+
+def score_deal(price, reference_price, units_per_day, max_units_per_day, quantity):
+    """Blend discount, velocity and stock into one 0..1 score."""
+    discount = float((reference_price - price) / reference_price) if reference_price else 0.0
+    velocity = (
+        math.log1p(units_per_day) / math.log1p(max_units_per_day)
+        if max_units_per_day else 0.0
+    )
+    stock = min(1.0, quantity / STOCK_COMFORT)
+    return DISCOUNT_WEIGHT * discount + VELOCITY_WEIGHT * velocity + STOCK_WEIGHT * stock
+
+
+def compute_hot_deals(limit=HOT_DEALS_LIMIT, window_days=DEAL_WINDOW_DAYS):
+    """Score all candidates and return unsaved HotDeal rows for the top ``limit``."""
+    candidates = list(deal_candidates(window_days))
+    max_velocity = max((units for *_, units in candidates), default=0) / window_days
+
+    def scored():
+        for pk, price, quantity, reference, units in candidates:
+            score = score_deal(price, reference, units / window_days, max_velocity, quantity)
+            yield score, pk, price, reference, units
+
+    best = heapq.nlargest(limit, scored(), key=lambda row: (row[0], row[1]))
+    return [
+        HotDeal(
+            product_id=pk,
+            rank=rank,
+            score=round(score, 6),
+            reference_price=reference,
+            discount_percent=int(100 * (reference - price) / reference) if reference else 0,
+            units_sold=units,
+        )
+        for rank, (score, pk, price, reference, units) in enumerate(best, start=1)
+    ]
+
+
+def refresh_hot_deals(limit=HOT_DEALS_LIMIT, window_days=DEAL_WINDOW_DAYS):
+    """Recompute and replace the HotDeal table; returns the new rows."""
+    deals = compute_hot_deals(limit, window_days)
+    with transaction.atomic():
+        HotDeal.objects.all().delete()
+        HotDeal.objects.bulk_create(deals)
+        transaction.on_commit(bump_catalog_version)
+    return deals
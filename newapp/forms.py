@@ -1,23 +1,135 @@
+from datetime import datetime, time, timedelta
+from pathlib import PurePosixPath
+
 from django import forms
 from django.contrib.auth import get_user_model
-from .models import Product, SellerProfile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from .models import Category, Order, Product, SellerProfile
 
 User = get_user_model()
 
 class ProductForm(forms.ModelForm):
+    # Free text like before; folded onto a shared Category row in save(), so
+    # a submission that fails validation never creates one
+    category = forms.CharField(
+        label="Category",
+        max_length=255,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Electronics, Clothing'}),
+    )
+
     class Meta:
         model = Product
-        exclude = ['seller']
+        exclude = ['seller', 'category']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Product Name'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Product Description'}),
             'price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'placeholder': '0.00'}),
+            'compare_at_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'placeholder': 'Original price (optional)'}),
             'quantity': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Available Quantity'}),
-            'product_type': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Electronics, Clothing'}),
             'image': forms.FileInput(attrs={'class': 'form-control'}),
             'return_policy': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 7 days return'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial['category'] = self.instance.category.name
+
+    def clean_category(self):
+        return ' '.join(self.cleaned_data['category'].split())
+
+    def get_category(self, name):
+        return Category.objects.for_name(name)
+
+    def save(self, commit=True):
+        # Joins the caller's transaction (a bulk import chunk) without a savepoint
+        with transaction.atomic(savepoint=False):
+            self.instance.category = self.get_category(self.cleaned_data['category'])
+            return super().save(commit)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        price = cleaned_data.get('price')
+        compare_at_price = cleaned_data.get('compare_at_price')
+        if price is not None and compare_at_price is not None and compare_at_price <= price:
+            self.add_error('compare_at_price', "The original price must be higher than the price.")
+        return cleaned_data
+
+class ProductImportForm(ProductForm):
+    """``ProductForm`` rules for one row of a bulk import (see ``bulk.py``).
+
+    The image is a path to a file already uploaded to the product images
+    folder of media storage rather than an upload, and categories are
+    looked up once per import via ``categories``.
+    """
+    image = forms.CharField(max_length=100)
+
+    def __init__(self, *args, categories=None, **kwargs):
+        self.categories = {} if categories is None else categories
+        super().__init__(*args, **kwargs)
+
+    def clean_image(self):
+        name = self.cleaned_data['image'].strip()
+        if self.instance.pk and name == self.instance.image.name:
+            return name
+        folder = Product._meta.get_field('image').upload_to
+        path = PurePosixPath(name)
+        if path.is_absolute() or '..' in path.parts or '\\' in name or not name.startswith(folder):
+            raise forms.ValidationError(f"Give the path of an uploaded image in {folder}.")
+        if not default_storage.exists(name):
+            raise forms.ValidationError(f"There is no image {name} in media storage.")
+        return name
+
+    def get_category(self, name):
+        key = name.lower()
+        if key not in self.categories:
+            self.categories[key] = super().get_category(name)
+        return self.categories[key]
+
+class ProductImportFileForm(forms.Form):
+    file = forms.FileField(
+        label="CSV or JSON Lines file",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.ndjson'}),
+    )
+
+class OrderFilterForm(forms.Form):
+    status = forms.ChoiceField(
+        choices=[('', 'All orders'), *Order.STATUS_CHOICES],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    placed_from = forms.DateField(
+        label="From", required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    placed_to = forms.DateField(
+        label="To", required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+
+    def filter(self, orders):
+        """Apply the valid filters to an Order queryset; invalid values are ignored."""
+        self.is_valid()
+        data = self.cleaned_data
+        if data.get('status'):
+            orders = orders.filter(status=data['status'])
+        # Whole-day ranges on created_at rather than __date, so the
+        # (buyer, created_at) indexes still apply
+        if data.get('placed_from'):
+            orders = orders.filter(created_at__gte=_start_of_day(data['placed_from']))
+        if data.get('placed_to'):
+            orders = orders.filter(created_at__lt=_start_of_day(data['placed_to'] + timedelta(days=1)))
+        return orders
+
+    @property
+    def is_filtered(self):
+        return any(self.cleaned_data.get(name) for name in self.fields)
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
 class UserRegisterForm(forms.ModelForm):
     password = forms.CharField(
         widget=forms.PasswordInput(attrs={'class': 'form-control', 'placeholder': 'Create a password'})
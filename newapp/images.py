@@ -0,0 +1,109 @@
+"""Resized, content-addressed copies of product images.
+
+Uploads are stored as-is by the form; afterwards a background task
+(``process_product_image``, run by ``manage.py runworker``) writes a WebP and a JPEG copy of the picture at
+each width in ``VARIANTS`` and records them in ``Product.image_variants``::
+
+    {"source": "products/desk.png",
+     "variants": {"card": {"width": 400, "height": 300,
+                           "webp": "products/variants/3fa4...-400.webp",
+                           "jpeg": "products/variants/3fa4...-400.jpg"}, ...}}
+
+File names start with a hash of the original's bytes, so they never change
+meaning and can be served with far-future cache headers, and re-processing
+an unchanged image is a no-op. ``{% product_picture %}`` (in
+``templatetags/product_images.py``) turns the variants into a ``<picture>``
+with width-based ``srcset``s and falls back to the original until they exist.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.exceptions import SuspiciousOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .catalog import bump_catalog_version
+from .models import Product
+from .tasks import task
+
+logger = logging.getLogger(__name__)
+
+# name -> width in CSS pixels; heights follow the original's aspect ratio
+VARIANTS = {
+    'thumb': 80,
+    'card': 400,
+    'detail': 900,
+}
+VARIANT_DIR = 'products/variants'
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def needs_processing(product):
+    return bool(product.image) and product.image_variants.get('source') != product.image.name
+
+
+def schedule_image_processing(product_id):
+    """Queue the product's image for processing by the task worker."""
+    process_product_image.enqueue(product_id=product_id)
+
+
+@task(max_attempts=3)
+def process_product_image(product_id, force=False):
+    """Write the variants of one product's image; returns True if anything changed."""
+    product = Product.objects.only('image', 'image_variants').filter(pk=product_id).first()
+    if product is None or not product.image or not (force or needs_processing(product)):
+        return False
+
+    source = product.image.name
+    try:
+        with product.image.open('rb') as original:
+            data = original.read()
+        image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+        image.load()
+    except (UnidentifiedImageError, OSError, SuspiciousOperation) as e:
+        logger.warning("Can't read image %s of product %s: %s", source, product_id, e)
+        return False
+
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    variants = {name: write_variant(image, digest, width) for name, width in VARIANTS.items()}
+
+    # Only store the result if nobody uploaded a different image meanwhile
+    updated = Product.objects.filter(pk=product_id, image=source).update(
+        image_variants={'source': source, 'variants': variants},
+    )
+    if updated:
+        bump_catalog_version()
+    return bool(updated)
+
+
+def write_variant(image, digest, width):
+    """Save WebP and JPEG copies of ``image`` at ``width`` (never upscaled)."""
+    width = min(width, image.width)
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.Resampling.LANCZOS)
+
+    variant = {'width': width, 'height': height}
+    has_alpha = resized.mode in ('RGBA', 'LA') or 'transparency' in resized.info
+    webp = resized.convert('RGBA' if has_alpha else 'RGB')
+    variant['webp'] = _save(webp, f'{digest}-{width}.webp', 'WEBP', quality=WEBP_QUALITY, method=4)
+
+    jpeg = webp
+    if has_alpha:
+        jpeg = Image.new('RGB', webp.size, (255, 255, 255))
+        jpeg.paste(webp, mask=webp.getchannel('A'))
+    variant['jpeg'] = _save(
+        jpeg, f'{digest}-{width}.jpg', 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True,
+    )
+    return variant
+
+
+def _save(image, filename, image_format, **options):
+    name = f'{VARIANT_DIR}/{filename}'
+    if not default_storage.exists(name):
+        buffer = BytesIO()
+        image.save(buffer, image_format, **options)
+        name = default_storage.save(name, ContentFile(buffer.getvalue()))
+    return name
@@ -0,0 +1,203 @@
+import json
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from newapp import metrics, urls
+from newapp.models import CustomUser, Order, Product
+from newapp.seeding import NOUNS, seed_catalog
+
+# Who requests each route; routes not listed here are requested anonymously.
+BUYER_ROUTES = {
+    'account', 'buyer_dashboard', 'edit_profile', 'my_orders', 'cart',
+    'api_cart', 'api_orders', 'api_order_detail',
+}
+SELLER_ROUTES = {
+    'seller_dashboard', 'addproduct', 'showproduct', 'updateproduct', 'deleteproduct',
+    'import_products', 'export_products',
+}
+STAFF_ROUTES = {'perf'}
+# Routes that can't be benchmarked with repeated GETs, and why
+SKIPPED_ROUTES = {
+    'logout': "logs the client out",
+    'add_to_cart': "POST only",
+    'remove_from_cart': "deletes the cart item",
+    'create_order': "POST only",
+    'api_token': "POST only",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "GET every route in newapp/urls.py with the test client on a throwaway test "
+        "database (the configured engine's, as for manage.py test) filled by the seeder, "
+        "and report p50/p95/p99 latency and query counts per route as JSON. Never "
+        "touches the configured database's data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help="Timed requests per route.")
+        parser.add_argument('--cold', action='store_true', help="Clear the cache before every request.")
+        parser.add_argument('--routes', nargs='+', metavar='NAME', help="Only these URL names.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--sellers', type=int, default=20)
+        parser.add_argument('--buyers', type=int, default=200)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--items-per-order', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1.")
+        names = list(dict.fromkeys(p.name for p in urls.urlpatterns))
+        if options['routes']:
+            unknown = set(options['routes']) - set(names)
+            if unknown:
+                raise CommandError(f"Unknown routes: {', '.join(sorted(unknown))}.")
+            names = [name for name in names if name in options['routes']]
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            seeded = seed_catalog(
+                sellers=options['sellers'],
+                buyers=options['buyers'],
+                products=options['products'],
+                orders=options['orders'],
+                items_per_order=options['items_per_order'],
+                carts=options['buyers'],
+                seed=options['seed'],
+            )
+            self.stderr.write(
+                f"Seeded {seeded.products} products and {seeded.order_items} order items "
+                f"in {sum(seeded.timings.values()):.1f}s"
+            )
+            fixtures = self._fixtures()
+            routes, skipped = {}, {}
+            for name in names:
+                if name in SKIPPED_ROUTES:
+                    skipped[name] = SKIPPED_ROUTES[name]
+                    continue
+                routes[name] = self._bench(name, fixtures, options['requests'], options['cold'])
+                self.stderr.write(f"{name:>20}: p50={routes[name]['p50_ms']:.1f}ms "
+                                  f"queries={routes[name]['max_queries']}")
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'database': connection.vendor,
+            'requests_per_route': options['requests'],
+            'cold_cache': options['cold'],
+            'scale': {
+                'products': seeded.products,
+                'orders': seeded.orders,
+                'order_items': seeded.order_items,
+                'buyers': seeded.buyers,
+                'sellers': seeded.sellers,
+            },
+            'routes': routes,
+            'skipped': skipped,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def _fixtures(self):
+        """The users and objects the routes are requested with."""
+        seller = (
+            CustomUser.objects.filter(role='seller')
+            .annotate(n=Count('product')).order_by('-n').first()
+        )
+        buyer = (
+            CustomUser.objects.filter(role='buyer')
+            .annotate(n=Count('order')).order_by('-n').first()
+        )
+        product = Product.objects.filter(seller=seller, is_available=True).select_related('category').first()
+        return {
+            'users': {
+                'buyer': buyer,
+                'seller': seller,
+                'staff': CustomUser.objects.create_user('bench-staff', is_staff=True),
+            },
+            'kwargs': {
+                'category_products': {'slug': product.category.slug},
+                'product_detail': {'product_id': product.pk},
+                'updateproduct': {'product_id': product.pk},
+                'deleteproduct': {'product_id': product.pk},
+                'api_product_detail': {'pk': product.pk},
+                'api_order_detail': {'pk': Order.objects.filter(buyer=buyer).latest('created_at').pk},
+            },
+        }
+
+    def _bench(self, name, fixtures, count, cold):
+        pattern = next(p for p in urls.urlpatterns if p.name == name)
+        role = (
+            'staff' if name in STAFF_ROUTES
+            else 'seller' if name in SELLER_ROUTES
+            else 'buyer' if name in BUYER_ROUTES
+            else 'anonymous'
+        )
+        client = Client()
+        if role != 'anonymous':
+            client.force_login(fixtures['users'][role])
+        path = reverse(name, kwargs=fixtures['kwargs'].get(name, {}))
+
+        def get(n):
+            params = {'q': NOUNS[n % len(NOUNS)]} if name == 'search' else {}
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(path, params)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = 1000 * (time.perf_counter() - started)
+            return response.status_code, elapsed, queries.captured_queries
+
+        # Warm up connections, caches and lazily-built indexes
+        get(0)
+        statuses, latencies, query_counts, db_times = [], [], [], []
+        for n in range(count):
+            status, elapsed, queries = get(n)
+            statuses.append(status)
+            latencies.append(elapsed)
+            query_counts.append(len(queries))
+            db_times.append(sum(1000 * float(q['time']) for q in queries))
+
+        latencies.sort()
+        budget = metrics.budget_for(pattern.callback)
+        return {
+            'path': path,
+            'user': role,
+            'status': statistics.mode(statuses),
+            'errors': sum(status >= 400 for status in statuses),
+            'mean_ms': statistics.fmean(latencies),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'mean_queries': statistics.fmean(query_counts),
+            'max_queries': max(query_counts),
+            'mean_db_ms': statistics.fmean(db_times),
+            'query_budget': budget,
+            'over_budget': budget is not None and max(query_counts) > budget,
+        }
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
@@ -0,0 +1,102 @@
+import random
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+
+from newapp import search
+from newapp.models import Category, CustomUser, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark product search on a throwaway test database filled with "
+        "synthetic products. Never touches the configured database's data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            vocabulary = self._populate(rng, options['products'])
+            queries = self._queries(rng, vocabulary, options['queries'])
+
+            backends = [('inverted-index', self._inverted_index())]
+            if search.fts_available():
+                backends.insert(0, ('fts5', search._fts_search))
+            for name, backend in backends:
+                self._report(name, backend, queries)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    def _populate(self, rng, count):
+        started = time.perf_counter()
+        vocabulary = sorted({
+            ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+            for _ in range(5000)
+        })
+        seller = CustomUser.objects.create_user('bench-seller', role='seller')
+        categories = Category.objects.bulk_create(
+            Category(name=word.title(), slug=word) for word in rng.sample(vocabulary, 40)
+        )
+        Product.objects.bulk_create(
+            (
+                Product(
+                    seller=seller,
+                    name=' '.join(rng.choices(vocabulary, k=3)).title(),
+                    description=' '.join(rng.choices(vocabulary, k=25)),
+                    price=rng.randint(100, 500_000) / 100,
+                    quantity=rng.randint(0, 100),
+                    category=rng.choice(categories),
+                    image='products/bench.jpg',
+                    return_policy='7 days',
+                )
+                for _ in range(count)
+            ),
+            batch_size=2000,
+        )
+        search.fts_rebuild()
+        self.stdout.write(f"Loaded {count} products in {time.perf_counter() - started:.1f}s")
+        return vocabulary
+
+    def _queries(self, rng, vocabulary, count):
+        category_ids = list(Category.objects.values_list('id', flat=True))
+        queries = []
+        for _ in range(count):
+            terms = [word[:rng.randint(3, len(word))] for word in rng.sample(vocabulary, rng.choice((1, 1, 2)))]
+            filters = search.SearchFilters()
+            if rng.random() < 0.3:
+                filters.category_id = rng.choice(category_ids)
+            if rng.random() < 0.3:
+                filters.max_price = rng.randint(500, 5000)
+            queries.append((terms, filters, rng.choice((0, 0, 0, 20, 40))))
+        return queries
+
+    def _inverted_index(self):
+        started = time.perf_counter()
+        index = search.InvertedIndex.from_database()
+        self.stdout.write(f"Built inverted index in {time.perf_counter() - started:.1f}s")
+        return index.search
+
+    def _report(self, name, backend, queries):
+        timings = []
+        hits = 0
+        for terms, filters, offset in queries:
+            started = time.perf_counter()
+            ids, total = backend(terms, filters, offset, search.SEARCH_PAGE_SIZE)
+            timings.append((time.perf_counter() - started) * 1000)
+            hits += bool(total)
+        timings.sort()
+        quantiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f"{name:>15}: {len(queries)} queries ({hits} with hits)  "
+            f"p50={quantiles[49]:.2f}ms p95={quantiles[94]:.2f}ms "
+            f"p99={quantiles[98]:.2f}ms max={timings[-1]:.2f}ms"
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from newapp.recommendations import MIN_CO_ORDERS, RECOMMENDATIONS_PER_PRODUCT, build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuild the \"customers also bought\" recommendations from order history (run nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=RECOMMENDATIONS_PER_PRODUCT,
+                            help="Recommendations kept per product.")
+        parser.add_argument('--min-co-orders', type=int, default=MIN_CO_ORDERS,
+                            help="Ignore pairs bought together fewer times than this.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        products = build_recommendations(
+            options['limit'], options['min_co_orders'], options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Built recommendations for {products} products."))
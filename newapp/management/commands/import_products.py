@@ -0,0 +1,47 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from newapp.bulk import FORMATS, IMPORT_CHUNK_SIZE, ImportFileError, guess_format, import_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update a seller's products from a CSV or JSON Lines file "
+        "(same columns as the seller export)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('seller', help="Username of the seller.")
+        parser.add_argument('path', help="File to import, or - for stdin.")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="Defaults to jsonl for .jsonl/.ndjson files, csv otherwise.")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help="Rows written per transaction.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            seller = User.objects.get(username=options['seller'], role='seller')
+        except User.DoesNotExist:
+            raise CommandError(f"No seller named {options['seller']!r}.")
+
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        try:
+            if path == '-':
+                result = import_products(seller, sys.stdin.buffer, file_format, options['chunk_size'])
+            else:
+                with open(path, 'rb') as stream:
+                    result = import_products(seller, stream, file_format, options['chunk_size'])
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... and {result.error_count - len(result.errors)} more")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.created}, updated {result.updated}, skipped {result.error_count}."
+        ))
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SERVERS = {
+    # One process each, so the comparison is per worker. The WSGI side gets
+    # a thread pool, which is how it would normally serve concurrent users.
+    'wsgi': lambda port, threads: [
+        sys.executable, '-m', 'gunicorn', 'seventhjune.wsgi:application',
+        '--bind', f'127.0.0.1:{port}', '--workers', '1',
+        '--worker-class', 'gthread', '--threads', str(threads), '--log-level', 'warning',
+    ],
+    'asgi': lambda port, threads: [
+        sys.executable, '-m', 'uvicorn', 'seventhjune.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--workers', '1', '--log-level', 'warning',
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the site under WSGI (gunicorn) and ASGI (uvicorn) and compare "
+        "throughput and latency. Needs gunicorn and uvicorn installed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/index/', '/hotdeal/'],
+                            help="URL paths to request, round-robin.")
+        parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help="Simultaneous keep-alive connections.")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per server.")
+        parser.add_argument('--threads', type=int, default=8, help="gunicorn threads (WSGI).")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        results = {}
+        for name in options['servers']:
+            module = 'gunicorn' if name == 'wsgi' else 'uvicorn'
+            try:
+                __import__(module)
+            except ImportError:
+                raise CommandError(f"{module} is not installed (pip install {module}).")
+
+            with run_server(SERVERS[name], options['threads']) as port:
+                # Warm up caches and connections before measuring
+                asyncio.run(load(port, options['paths'], 4, 1.0))
+                results[name] = asyncio.run(
+                    load(port, options['paths'], options['concurrency'], options['duration'])
+                )
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'server':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<6} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                f"{r['p99_ms']:>8.1f} {r['errors']:>7}"
+            )
+
+
+@contextmanager
+def run_server(command, threads):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+    process = subprocess.Popen(command(port, threads), cwd=settings.BASE_DIR, env=env)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise CommandError(f"Server did not start: {' '.join(command(port, threads))}")
+                time.sleep(0.1)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def load(port, paths, concurrency, duration):
+    """Hammer the server from ``concurrency`` keep-alive connections for ``duration`` seconds."""
+    latencies = []
+    errors = 0
+    stop_at = time.monotonic() + duration
+
+    async def client(offset):
+        nonlocal errors
+        reader = writer = None
+        i = offset
+        while time.monotonic() < stop_at:
+            path = paths[i % len(paths)]
+            i += 1
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                started = time.perf_counter()
+                writer.write(
+                    f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: keep-alive\r\n\r\n'.encode()
+                )
+                status, keep_alive = await read_response(reader)
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    errors += 1
+                if not keep_alive:
+                    writer.close()
+                    writer = None
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                errors += 1
+                if writer is not None:
+                    writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    started = time.monotonic()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return 1000 * latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'mean_ms': 1000 * statistics.fmean(latencies) if latencies else 0.0,
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+    }
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns ``(status, keep_alive)``."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip().lower()
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while size := int((await reader.readuntil(b'\r\n')).strip(), 16):
+            await reader.readexactly(size + 2)
+        await reader.readuntil(b'\r\n')
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection') != 'close'
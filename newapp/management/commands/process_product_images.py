@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from newapp.images import needs_processing, process_product_image
+from newapp.models import Product
+
+
+class Command(BaseCommand):
+    help = "Create the resized WebP/JPEG variants of product images (backfill for existing media)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Re-process images that already have variants.")
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        force = options['force']
+        pending = [
+            product.pk
+            for product in Product.objects.only('image', 'image_variants').iterator()
+            if force or needs_processing(product)
+        ]
+
+        def process(product_id):
+            close_old_connections()
+            try:
+                return process_product_image(product_id, force=force)
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            done = sum(executor.map(process, pending))
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {done} of {len(pending)} product images."
+        ))
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from newapp.analytics import rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily seller/product sales rollups from OrderItem."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seller', help="Only rebuild this seller's rows (username).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        seller = None
+        if options['seller']:
+            User = get_user_model()
+            try:
+                seller = User.objects.get(username=options['seller'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['seller']!r}.")
+
+        seller_rows, product_rows = rebuild_sales_rollup(seller, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {seller_rows} seller-day and {product_rows} product-day rows."
+        ))
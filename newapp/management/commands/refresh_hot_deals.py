@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from newapp.deals import DEAL_WINDOW_DAYS, HOT_DEALS_LIMIT, refresh_hot_deals
+
+
+class Command(BaseCommand):
+    help = "Re-score products and rebuild the hot deals list (run from cron, e.g. every 15 minutes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=HOT_DEALS_LIMIT)
+        parser.add_argument('--window-days', type=int, default=DEAL_WINDOW_DAYS)
+
+    def handle(self, *args, **options):
+        deals = refresh_hot_deals(options['limit'], options['window_days'])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {len(deals)} hot deals."))
@@ -0,0 +1,56 @@
+import signal
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from newapp import tasks
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (order emails, image processing, ...) until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Tasks run in parallel.")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Run everything that is due, then exit.")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        worker = tasks.worker_name()
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write("Stopping after the running tasks finish...")
+            stopping.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        self.stdout.write(f"Worker {worker} started with {concurrency} threads.")
+
+        outcomes = Counter()
+        running = set()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='task') as executor:
+            while not stopping.is_set():
+                tasks.requeue_stale()
+                free = concurrency - len(running)
+                claimed = tasks.claim(worker, free) if free else []
+                running.update(executor.submit(tasks.run_in_thread, task_row) for task_row in claimed)
+
+                if not running:
+                    if options['once']:
+                        break
+                    stopping.wait(options['poll_interval'])
+                    continue
+
+                # Wake up when a slot frees, or poll for new work meanwhile
+                done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                outcomes.update(future.result() for future in done)
+
+            outcomes.update(future.result() for future in wait(running).done)
+        self.stdout.write(self.style.SUCCESS(
+            f"Worker {worker} stopped: {outcomes[True]} tasks succeeded, {outcomes[False]} failed."
+        ))
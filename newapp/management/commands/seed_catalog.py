@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from newapp.seeding import SEED_BATCH_SIZE, SEED_PASSWORD, seed_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the configured database with synthetic sellers, buyers, products, orders "
+        "and carts, e.g. --products 100000 --orders 250000 for a million order items. "
+        "Adds to whatever is there; refuses to run with DEBUG off unless --force is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sellers', type=int, default=20)
+        parser.add_argument('--buyers', type=int, default=500)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=10_000)
+        parser.add_argument('--items-per-order', type=int, default=4, help="Mean lines per order.")
+        parser.add_argument('--carts', type=int, default=200, help="Buyers who get a filled cart.")
+        parser.add_argument('--days', type=int, default=365, help="Spread creation dates over this many days.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=SEED_BATCH_SIZE)
+        parser.add_argument('--force', action='store_true', help="Seed even with DEBUG off.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError("DEBUG is off; this looks like a real database. Use --force to seed it anyway.")
+        for name in ('sellers', 'buyers', 'items_per_order', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+
+        result = seed_catalog(
+            sellers=options['sellers'],
+            buyers=options['buyers'],
+            products=options['products'],
+            orders=options['orders'],
+            items_per_order=options['items_per_order'],
+            carts=options['carts'],
+            days=options['days'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        for step, seconds in result.timings.items():
+            self.stdout.write(f"{step:>10}: {seconds:.1f}s")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.sellers} sellers, {result.buyers} buyers, {result.products} products, "
+            f"{result.orders} orders ({result.order_items} items) and {result.carts} carts "
+            f"({result.cart_items} items). Seeded users' password: {SEED_PASSWORD!r}."
+        ))
@@ -0,0 +1,251 @@
+"""Per-request query count, DB time, template time and latency.
+
+``RequestMetricsMiddleware`` (first in ``MIDDLEWARE``) starts a
+``RequestMetrics`` for every request in a context variable. Every database
+connection gets an execute wrapper when it is opened (``install``, hooked up
+in ``signals.py``) that counts and times queries against it -- including
+the queries async views run on ``sync_to_async`` threads, which have their
+own connections but inherit the context. The ``DjangoTemplates`` backend
+below times template rendering. Each response
+gets a ``Server-Timing`` header (shown in the browser's network panel) and
+the last ``METRICS_BUFFER_SIZE`` requests are kept in memory, per process,
+for the staff-only ``/perf/`` page.
+
+Views declare how many queries they may run with ``@query_budget(n)``
+(class-based API views set a ``query_budget`` attribute). ``n`` covers GET
+and HEAD; writes declare their own, e.g. ``@query_budget(4, POST=9)`` or
+``query_budget = {'GET': 4, 'PATCH': 12}``, and methods without one aren't
+checked. Budgets hold with a cold cache and database sessions, the setup
+without a shared cache (see settings.py); cached sessions and users only
+lower the count. Going over the budget logs a warning here; the test suite requests
+every budgeted route and method and fails on it, so an N+1 shows up in CI.
+"""
+import logging
+import statistics
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.template.backends import django as django_backend
+from django.template.exceptions import TemplateDoesNotExist
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+METRICS_BUFFER_SIZE = 500
+
+_current = ContextVar('request_metrics', default=None)
+_recent = deque(maxlen=METRICS_BUFFER_SIZE)
+
+
+def query_budget(queries=None, **methods):
+    """Declare the most queries a view may run per GET (``queries``) and per other method."""
+    budgets = {**({'GET': queries} if queries is not None else {}), **methods}
+
+    def decorator(view):
+        view.query_budget = budgets
+        return view
+    return decorator
+
+
+def budgets_for(view):
+    """The declared query budgets of a URL callback, as ``{method: queries}``."""
+    budget = getattr(view, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view, 'cls', None), 'query_budget', None)
+    if isinstance(budget, int):
+        budget = {'GET': budget}
+    return dict(budget or {})
+
+
+def budget_for(view, method='GET'):
+    """The query budget of a URL callback for ``method`` (HEAD as GET), or ``None``."""
+    return budgets_for(view).get('GET' if method == 'HEAD' else method)
+
+
+@dataclass
+class RequestMetrics:
+    method: str
+    path: str
+    view: str = ''
+    status: int = 0
+    budget: int = None
+    queries: int = 0
+    # Queries whose SQL already ran in this request -- the N in "N+1"
+    repeated_queries: int = 0
+    db_time: float = 0.0
+    template_time: float = 0.0
+    total_time: float = 0.0
+    at: object = field(default_factory=timezone.now)
+    started: float = field(default_factory=time.perf_counter, repr=False)
+    statements: Counter = field(default_factory=Counter, repr=False)
+    rendering: int = field(default=0, repr=False)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Time and count one query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+
+    @property
+    def db_ms(self):
+        return 1000 * self.db_time
+
+    @property
+    def template_ms(self):
+        return 1000 * self.template_time
+
+    @property
+    def total_ms(self):
+        return 1000 * self.total_time
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+
+    def finish(self, request, response):
+        self.total_time = time.perf_counter() - self.started
+        self.status = response.status_code
+        self.repeated_queries = sum(n - 1 for n in self.statements.values())
+        self.statements = None
+        match = request.resolver_match
+        if match:
+            self.view = match.view_name
+            self.budget = budget_for(match.func, self.method)
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.db_ms:.1f};desc="{self.queries} queries", '
+            f'tpl;dur={self.template_ms:.1f}, '
+            f'total;dur={self.total_ms:.1f}'
+        )
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install(connection):
+    """Count ``connection``'s queries towards the current request's metrics."""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics(request.method, request.path)
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(request.method, request.path)
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, metrics)
+
+    def record(self, request, response, metrics):
+        metrics.finish(request, response)
+        response['Server-Timing'] = metrics.server_timing()
+        _recent.append(metrics)
+        if metrics.over_budget:
+            logger.warning(
+                "%s ran %d queries (budget %d, %d repeated): %s",
+                metrics.view, metrics.queries, metrics.budget, metrics.repeated_queries, metrics.path,
+            )
+        return response
+
+
+def recent_requests():
+    """The buffered requests, newest first."""
+    return list(reversed(_recent))
+
+
+def view_summary(requests):
+    """Per-view (and per write method) request count, query and latency statistics, busiest first."""
+    by_view = {}
+    for metrics in requests:
+        view = metrics.view or metrics.path
+        if metrics.method not in ('GET', 'HEAD'):
+            # Writes have their own budgets
+            view = f'{metrics.method} {view}'
+        by_view.setdefault(view, []).append(metrics)
+    rows = []
+    for view, items in by_view.items():
+        latencies = sorted(m.total_ms for m in items)
+        rows.append({
+            'view': view,
+            'requests': len(items),
+            'budget': items[0].budget,
+            'mean_queries': statistics.fmean(m.queries for m in items),
+            'max_queries': max(m.queries for m in items),
+            'mean_db_ms': statistics.fmean(m.db_ms for m in items),
+            'mean_template_ms': statistics.fmean(m.template_ms for m in items),
+            'p50_ms': latencies[len(latencies) // 2],
+            'p95_ms': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+            'over_budget': sum(m.over_budget for m in items),
+        })
+    rows.sort(key=lambda row: -row['requests'])
+    return rows
+
+
+def clear():
+    _recent.clear()
+
+
+# ---------------------------
+# Template timing
+# ---------------------------
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None or metrics.rendering:
+            # Nested renders are already inside the outer render's time
+            return super().render(context, request)
+        metrics.rendering += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.rendering -= 1
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The stock Django template backend, with render time added to the request metrics."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
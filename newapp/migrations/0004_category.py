@@ -0,0 +1,56 @@
+# Generated by Django 5.2.1 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def fold_product_types(apps, schema_editor):
+    """Create one Category per distinct (case/whitespace-insensitive) product_type."""
+    Category = apps.get_model('newapp', 'Category')
+    Product = apps.get_model('newapp', 'Product')
+
+    categories = {}
+    for product_type in Product.objects.values_list('product_type', flat=True).distinct():
+        name = ' '.join((product_type or '').split()) or 'Other'
+        slug = slugify(name) or 'other'
+        if slug not in categories:
+            categories[slug], _ = Category.objects.get_or_create(
+                slug=slug, defaults={'name': name.title()}
+            )
+        Product.objects.filter(product_type=product_type).update(category=categories[slug])
+
+
+def unfold_product_types(apps, schema_editor):
+    Category = apps.get_model('newapp', 'Category')
+    Product = apps.get_model('newapp', 'Product')
+    for category in Category.objects.all():
+        Product.objects.filter(category=category).update(product_type=category.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newapp', '0003_alter_product_options_product_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('slug', models.SlugField(max_length=255, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='products', to='newapp.category'),
+        ),
+        migrations.RunPython(fold_product_types, unfold_product_types),
+    ]
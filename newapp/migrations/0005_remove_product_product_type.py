@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newapp', '0004_category'),
+    ]
+
+    operations = [
+        # Give the column a default first so that unapplying the removal can
+        # re-add it to a populated table (0004 then refills it from category).
+        migrations.AlterField(
+            model_name='product',
+            name='product_type',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='product_type',
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='products', to='newapp.category'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def record_current_prices(apps, schema_editor):
+    """Seed PriceHistory with today's prices so later drops have a baseline."""
+    Product = apps.get_model('newapp', 'Product')
+    PriceHistory = apps.get_model('newapp', 'PriceHistory')
+    PriceHistory.objects.bulk_create(
+        (PriceHistory(product_id=pk, price=price)
+         for pk, price in Product.objects.values_list('pk', 'price').iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newapp', '0008_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='compare_at_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='HotDeal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(unique=True)),
+                ('score', models.FloatField()),
+                ('reference_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount_percent', models.PositiveIntegerField(default=0)),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='hot_deal', to='newapp.product')),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='newapp.product')),
+            ],
+            options={
+                'verbose_name_plural': 'price history',
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['product', '-changed_at'], name='price_history_product_idx')],
+            },
+        ),
+        migrations.RunPython(record_current_prices, migrations.RunPython.noop),
+    ]
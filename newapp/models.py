@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.utils.text import slugify
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -22,25 +23,136 @@ class SellerProfile(models.Model):
 
     def __str__(self):
         return self.shop_name or self.user.username
-    
+
+class CategoryManager(models.Manager):
+    def for_name(self, name):
+        """Return the category for a free-text name, creating it if needed.
+
+        Names are folded through their slug, so "electronics", "Electronics"
+        and " ELECTRONICS " all resolve to the same row.
+        """
+        name = ' '.join((name or '').split()) or 'Other'
+        category, created = self.get_or_create(
+            slug=slugify(name) or 'other',
+            defaults={'name': name.title()},
+        )
+        return category
+
+class Category(models.Model):
+    name = models.CharField(max_length=255)
+    slug = models.SlugField(max_length=255, unique=True)
+
+    objects = CategoryManager()
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'categories'
+
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Products with their category, seller and shop profile joined in, for product cards."""
+        return self.select_related('category', 'seller__sellerprofile')
+
 class Product(models.Model):
     seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # "Was" price shown struck through next to ``price``; blank = no discount
+    compare_at_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     quantity = models.PositiveIntegerField()
-    product_type = models.CharField(max_length=255)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='products')
     image = models.ImageField(upload_to='products/')
+    # Resized copies of ``image``, written by images.process_product_image
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     return_policy = models.CharField(max_length=100)
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so saves can tell whether the price or the image changed
+        instance._loaded_price = instance.__dict__.get('price')
+        instance._loaded_image = str(instance.__dict__.get('image') or '')
+        return instance
+
+    @property
+    def price_changed(self):
+        return getattr(self, '_loaded_price', None) != self.price
+
+    @property
+    def image_changed(self):
+        return getattr(self, '_loaded_image', None) != (self.image.name or '')
+
+    @property
+    def discount_percent(self):
+        if not self.compare_at_price or self.compare_at_price <= self.price:
+            return 0
+        return int(100 * (self.compare_at_price - self.price) / self.compare_at_price)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Partial indexes over available products only. Backends without
+            # partial index support (MySQL) skip these and use the FK indexes.
+            # Newest available products (hot deals and other global listings).
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_available=True),
+                name='product_live_recent_idx',
+            ),
+            # Landing page rows, category pages and related products.
+            models.Index(
+                fields=['category', '-created_at', '-id'],
+                condition=models.Q(is_available=True),
+                name='product_category_live_idx',
+            ),
+            # Seller dashboard / product management.
+            models.Index(fields=['seller', '-created_at'], name='product_seller_recent_idx'),
+        ]
+
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Orders with their items, products and sellers fetched in one extra query."""
+        return self.prefetch_related(
+            models.Prefetch(
+                'items',
+                queryset=OrderItem.objects.select_related('product__seller__sellerprofile'),
+            )
+        )
+
+    def with_summary(self, preview=3):
+        """Orders with ``item_count``/``unit_count`` and their first ``preview`` items.
+
+        The counts are correlated subqueries, so they are only computed for
+        the rows actually fetched, and the prefetch is sliced per order
+        (into ``preview_items``), so a 200-line order costs no more to list
+        than a 3-line one.
+        """
+        items = OrderItem.objects.filter(order=models.OuterRef('pk')).order_by().values('order')
+        return self.annotate(
+            item_count=models.Subquery(items.annotate(n=models.Count('pk')).values('n')),
+            unit_count=models.Subquery(items.annotate(n=models.Sum('quantity')).values('n')),
+        ).prefetch_related(
+            models.Prefetch(
+                'items',
+                queryset=(
+                    OrderItem.objects.select_related('product__seller__sellerprofile')
+                    .order_by('id')[:preview]
+                ),
+                to_attr='preview_items',
+            )
+        )
 
 class Order(models.Model):
     STATUS_CHOICES = (
@@ -58,11 +170,26 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     shipping_address = models.TextField()
 
+    objects = OrderQuerySet.as_manager()
+
     def __str__(self):
         return f"Order #{self.id} - {self.buyer.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so saves can tell whether the order was (un)cancelled
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # My orders / buyer dashboard, keyset-paginated on (created_at, id).
+            models.Index(fields=['buyer', '-created_at', '-id'], name='order_buyer_recent_idx'),
+            # My orders filtered by status.
+            models.Index(fields=['buyer', 'status', '-created_at', '-id'], name='order_buyer_status_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
@@ -77,14 +204,126 @@ class Cart(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+class CartItemQuerySet(models.QuerySet):
+    def with_products(self):
+        """Cart items with product, seller and shop profile joined in."""
+        return self.select_related('product__category', 'product__seller__sellerprofile')
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = ('cart', 'product')
 
     def get_total_price(self):
-        return self.quantity * self.product.price
\ No newline at end of file
+        return self.quantity * self.product.price
+
+class SellerDailySales(models.Model):
+    """Per-seller daily sales totals, kept up to date as orders are placed.
+
+    Rebuild from OrderItem with ``manage.py rebuild_sales_rollup``.
+    """
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'day'], name='unique_seller_day_sales'),
+        ]
+
+class ProductDailySales(models.Model):
+    """Per-product daily sales totals; same lifecycle as SellerDailySales."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='product_daily_sales')
+    day = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='unique_product_day_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'day'], name='product_sales_seller_day_idx'),
+        ]
+
+class PriceHistory(models.Model):
+    """Every price a product has had, written whenever the price changes."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-changed_at']
+        verbose_name_plural = 'price history'
+        indexes = [
+            models.Index(fields=['product', '-changed_at'], name='price_history_product_idx'),
+        ]
+
+class HotDeal(models.Model):
+    """The current top-N deals, materialized by ``manage.py refresh_hot_deals``."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='hot_deal')
+    rank = models.PositiveIntegerField(unique=True)
+    score = models.FloatField()
+    reference_price = models.DecimalField(max_digits=10, decimal_places=2)
+    discount_percent = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['rank']
+
+class ProductRecommendation(models.Model):
+    """"Bought together" neighbours of a product, built by ``manage.py build_recommendations``."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_for')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_product_recommendation_rank'),
+        ]
+
+class Task(models.Model):
+    """A unit of background work, run by ``manage.py runworker`` (see tasks.py)."""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            # The worker's "what is due?" poll.
+            models.Index(fields=['status', 'run_at'], name='task_due_idx'),
+        ]
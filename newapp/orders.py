@@ -0,0 +1,94 @@
+"""Checkout: turning a buyer's cart into an order."""
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .analytics import record_order_sales
+from .carts import invalidate_cart_summary
+from .catalog import bump_stock_versions
+from .models import CartItem, Order, OrderItem, Product
+from .tasks import task
+
+
+class CheckoutError(Exception):
+    """The cart can't be checked out; the message is safe to show to the buyer."""
+
+
+class OutOfStock(CheckoutError):
+    def __init__(self, product, requested):
+        self.product = product
+        self.requested = requested
+        super().__init__(
+            f'Sorry, "{product.name}" is no longer available in the quantity you '
+            f'requested ({requested}). Please update your cart.'
+        )
+
+
+def place_order(user, shipping_address):
+    """Create an order from ``user``'s cart and empty the cart.
+
+    Runs in one transaction: stock is taken with a conditional
+    ``UPDATE ... SET quantity = quantity - n WHERE quantity >= n`` per
+    product, so two concurrent checkouts can never oversell, and any
+    shortage rolls the whole order back with ``OutOfStock``.
+    """
+    with transaction.atomic():
+        # Lock products in a stable order so concurrent checkouts can't deadlock
+        cart_items = list(
+            CartItem.objects.select_related('product')
+            .filter(cart__user=user)
+            .order_by('product_id')
+        )
+        if not cart_items:
+            raise CheckoutError('Your cart is empty.')
+        if not shipping_address:
+            raise CheckoutError('Shipping address is required.')
+
+        for item in cart_items:
+            reserved = Product.objects.filter(
+                pk=item.product_id,
+                is_available=True,
+                quantity__gte=item.quantity,
+            ).update(quantity=F('quantity') - item.quantity, updated_at=timezone.now())
+            if not reserved:
+                raise OutOfStock(item.product, item.quantity)
+
+        order = Order.objects.create(
+            buyer=user,
+            total_amount=sum(item.get_total_price() for item in cart_items),
+            shipping_address=shipping_address,
+        )
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=item.product,
+                quantity=item.quantity,
+                price=item.product.price,
+            )
+            for item in cart_items
+        ])
+        record_order_sales(order, order_items)
+        CartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+        send_order_confirmation.enqueue(order_id=order.pk)
+        # Stock levels are shown on product pages and in the API
+        product_ids = [item.product_id for item in cart_items]
+        transaction.on_commit(lambda: bump_stock_versions(product_ids))
+    invalidate_cart_summary(user.pk)
+    return order
+
+
+@task(max_attempts=8)
+def send_order_confirmation(order_id):
+    """Email the buyer a summary of their order (runs on the task worker)."""
+    order = Order.objects.with_items().select_related('buyer').filter(pk=order_id).first()
+    if order is None or not order.buyer.email:
+        return
+    send_mail(
+        subject=f'Your order #{order.pk} is confirmed',
+        message=render_to_string('emails/order_confirmation.txt', {'order': order}),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[order.buyer.email],
+    )
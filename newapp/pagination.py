@@ -0,0 +1,47 @@
+"""Keyset ("seek") pagination for newest-first querysets.
+
+Pages are addressed by an opaque cursor built from the ``(created_at, id)``
+pair of the last row shown, so fetching page N costs the same as page 1
+instead of scanning and discarding ``OFFSET`` rows.
+"""
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SEPARATOR = '~'
+
+
+def encode_cursor(obj):
+    """Build the cursor that points just past ``obj``."""
+    return f"{obj.created_at.isoformat()}{CURSOR_SEPARATOR}{obj.pk}"
+
+
+def decode_cursor(value):
+    """Return ``(created_at, pk)`` for a cursor, or ``None`` if it is malformed."""
+    if not value:
+        return None
+    created_at, _, pk = value.rpartition(CURSOR_SEPARATOR)
+    try:
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor=None, size=12):
+    """Return ``(items, next_cursor)`` for one page ordered by ``-created_at, -id``.
+
+    ``next_cursor`` is ``None`` when there are no further rows.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    items = list(queryset[:size + 1])
+    next_cursor = encode_cursor(items[size - 1]) if len(items) > size else None
+    return items[:size], next_cursor
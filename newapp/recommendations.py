@@ -0,0 +1,111 @@
+"""Item-to-item "customers also bought" recommendations.
+
+``build_recommendations`` reads every non-cancelled order once, counts how
+often each pair of products shares an order, and keeps the best
+``RECOMMENDATIONS_PER_PRODUCT`` neighbours of every product in the
+ProductRecommendation table, ranked by cosine similarity
+
+    co_orders(a, b) / sqrt(orders(a) * orders(b))
+
+so that products which are simply popular don't crowd out everything else.
+The co-occurrence matrix is kept sparse (a dict of Counters holding only
+pairs that were actually bought together).
+
+``arelated_products`` is what product pages call: one indexed lookup, topped
+up with the newest products of the same category when a product has too few
+co-purchases.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, groupby, islice
+
+from django.db import transaction
+
+from .models import OrderItem, Product, ProductRecommendation
+
+RECOMMENDATIONS_PER_PRODUCT = 8
+RELATED_PRODUCTS_SHOWN = 4
+MIN_CO_ORDERS = 1
+# Very large orders (bulk buys) say little about what goes together and cost
+# O(n^2) pairs, so only this many distinct products per order are counted.
+MAX_BASKET_SIZE = 50
+
+
+async def arelated_products(product, limit=RELATED_PRODUCTS_SHOWN):
+    """Recommended products for ``product``, falling back to its category."""
+    products = [p async for p in _recommended(product)[:limit]]
+    if len(products) < limit:
+        products += [p async for p in _same_category(product, products)[:limit - len(products)]]
+    return products
+
+
+def _recommended(product):
+    return Product.objects.filter(
+        recommended_for__product=product, is_available=True,
+    ).order_by('recommended_for__rank')
+
+
+def _same_category(product, exclude):
+    return Product.objects.filter(
+        category_id=product.category_id, is_available=True,
+    ).exclude(
+        id__in=[product.pk, *(p.pk for p in exclude)]
+    ).order_by('-created_at', '-id')
+
+
+def order_baskets():
+    """Yield the set of product ids in each non-cancelled order."""
+    rows = (
+        OrderItem.objects.exclude(order__status='cancelled')
+        .order_by('order_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=5000)
+    )
+    for _, items in groupby(rows, key=lambda row: row[0]):
+        basket = sorted({product_id for _, product_id in items})
+        yield basket[:MAX_BASKET_SIZE]
+
+
+def co_occurrence(baskets):
+    """Return ``(order counts per product, {a: Counter({b: co_orders})})``."""
+    orders = Counter()
+    pairs = defaultdict(Counter)
+    for basket in baskets:
+        orders.update(basket)
+        for a, b in combinations(basket, 2):
+            pairs[a][b] += 1
+            pairs[b][a] += 1
+    return orders, pairs
+
+
+def top_neighbours(orders, pairs, limit=RECOMMENDATIONS_PER_PRODUCT, min_co_orders=MIN_CO_ORDERS):
+    """Yield ``(product_id, [(score, neighbour_id), ...])`` best first."""
+    for product_id, neighbours in pairs.items():
+        scored = (
+            (count / math.sqrt(orders[product_id] * orders[other]), other)
+            for other, count in neighbours.items()
+            if count >= min_co_orders
+        )
+        best = heapq.nlargest(limit, scored)
+        if best:
+            yield product_id, best
+
+
+def build_recommendations(limit=RECOMMENDATIONS_PER_PRODUCT, min_co_orders=MIN_CO_ORDERS, batch_size=1000):
+    """Rebuild the ProductRecommendation table from order history.
+
+    Returns the number of products that got recommendations.
+    """
+    orders, pairs = co_occurrence(order_baskets())
+    neighbours = list(top_neighbours(orders, pairs, limit, min_co_orders))
+    rows = (
+        ProductRecommendation(product_id=product_id, recommended_id=other, rank=rank, score=round(score, 6))
+        for product_id, best in neighbours
+        for rank, (score, other) in enumerate(best, start=1)
+    )
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        while batch := list(islice(rows, batch_size)):
+            ProductRecommendation.objects.bulk_create(batch)
+    return len(neighbours)
@@ -0,0 +1,321 @@
+"""Product search over name, description and category.
+
+On SQLite the catalog is mirrored into an FTS5 virtual table
+(``newapp_product_fts``, created by migration 0008 and kept in sync by the
+signals in ``signals.py``) and ranked with bm25. Other backends, or SQLite
+builds without FTS5, use ``InvertedIndex``: an in-process index built from
+the database on first use and rebuilt once the catalog version moves on.
+
+Both backends AND the query terms together, treat every term as a prefix
+("lap" matches "laptop") and weight name > category > description.
+"""
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from itertools import islice
+
+from django.db import connection
+
+from .catalog import get_catalog_version
+from .models import Product
+
+FTS_TABLE = 'newapp_product_fts'
+SEARCH_PAGE_SIZE = 20
+
+# name, category, description -- same order as the FTS5 columns
+FIELD_WEIGHTS = (10.0, 5.0, 1.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Lower-cased word tokens with accents stripped (like FTS5's unicode61)."""
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return TOKEN_RE.findall(text)
+
+
+@dataclass
+class SearchFilters:
+    category_id: int = None
+    min_price: Decimal = None
+    max_price: Decimal = None
+
+
+@dataclass
+class SearchResults:
+    products: list
+    total: int
+    page: int
+    per_page: int
+    backend: str
+    terms: list = field(default_factory=list)
+
+    @property
+    def has_previous(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page * self.per_page < self.total
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.total / self.per_page))
+
+
+def search_products(query, filters=None, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Ranked, filtered, paginated product search; returns ``SearchResults``."""
+    filters = filters or SearchFilters()
+    terms = tokenize(query)
+    page = max(1, page)
+    offset = (page - 1) * per_page
+
+    if not terms:
+        ids, total, backend = [], 0, 'none'
+    elif fts_available():
+        ids, total = _fts_search(terms, filters, offset, per_page)
+        backend = 'fts5'
+    else:
+        ids, total = get_inverted_index().search(terms, filters, offset, per_page)
+        backend = 'inverted-index'
+
+    by_id = Product.objects.for_listing().in_bulk(ids)
+    products = [by_id[pk] for pk in ids if pk in by_id]
+    return SearchResults(products, total, page, per_page, backend, terms)
+
+
+# ---------------------------
+# SQLite FTS5 backend
+# ---------------------------
+# Database alias -> whether it has the FTS table. Checked once per alias
+# and forgotten when a connection is opened or migrations run (signals.py).
+_fts_tables = {}
+
+
+def fts_available(using=connection):
+    if using.vendor != 'sqlite':
+        return False
+    available = _fts_tables.get(using.alias)
+    if available is None:
+        with using.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+            )
+            available = _fts_tables[using.alias] = cursor.fetchone() is not None
+    return available
+
+
+def forget_fts_table(alias):
+    _fts_tables.pop(alias, None)
+
+
+def fts_match_expression(terms):
+    """``laptop gam`` -> ``"laptop"* AND "gam"*`` (quoted, so no FTS syntax leaks in)."""
+    return ' AND '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def fts_search_sql(filters):
+    """Return ``(where_sql, params)`` for the product-side filters of an FTS query."""
+    where = ['p.is_available']
+    params = []
+    if filters.category_id is not None:
+        where.append('p.category_id = %s')
+        params.append(filters.category_id)
+    if filters.min_price is not None:
+        where.append('p.price >= %s')
+        params.append(str(filters.min_price))
+    if filters.max_price is not None:
+        where.append('p.price <= %s')
+        params.append(str(filters.max_price))
+    return ' AND '.join(where), params
+
+
+def _fts_search(terms, filters, offset, limit):
+    where, params = fts_search_sql(filters)
+    match = fts_match_expression(terms)
+    # CROSS JOIN pins SQLite's join order: walk the (small) FTS match set and
+    # look products up by primary key, never probe FTS once per product row.
+    base = (
+        f'FROM {FTS_TABLE} f CROSS JOIN newapp_product p ON p.id = f.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s AND {where}'
+    )
+    weights = ', '.join(str(w) for w in FIELD_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT p.id {base} ORDER BY bm25({FTS_TABLE}, {weights}), p.id DESC '
+            f'LIMIT %s OFFSET %s',
+            [match, *params, limit, offset],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        if offset == 0 and len(ids) < limit:
+            total = len(ids)
+        else:
+            cursor.execute(f'SELECT COUNT(*) {base}', [match, *params])
+            total = cursor.fetchone()[0]
+    return ids, total
+
+
+def fts_index_products(product_ids):
+    """(Re)index the given products in the FTS table; unknown ids are removed."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        for batch in _batches(product_ids):
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', batch)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, category, description) '
+                f'SELECT p.id, p.name, c.name, p.description '
+                f'FROM newapp_product p JOIN newapp_category c ON c.id = p.category_id '
+                f'WHERE p.id IN ({placeholders})',
+                batch,
+            )
+
+
+def fts_rebuild():
+    """Re-create the whole FTS index from the product table (after bulk writes)."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, category, description) '
+            f'SELECT p.id, p.name, c.name, p.description '
+            f'FROM newapp_product p JOIN newapp_category c ON c.id = p.category_id'
+        )
+
+
+def fts_unindex_products(product_ids):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        for batch in _batches(product_ids):
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', batch)
+
+
+def _batches(ids, size=500):
+    """Split ids into lists small enough for SQLite's bound-parameter limit."""
+    ids = iter(ids)
+    while batch := list(islice(ids, size)):
+        yield batch
+
+
+# ---------------------------
+# Portable in-process backend
+# ---------------------------
+class InvertedIndex:
+    """Token -> {product id: weighted term frequency}, ranked with BM25.
+
+    Only available products are indexed. Prefix lookups walk a sorted
+    vocabulary with ``bisect``, so "lap" costs O(log V + matching tokens).
+    """
+
+    k1 = 1.2
+    b = 0.75
+    catalog_version = None
+
+    def __init__(self, rows):
+        """``rows`` yields ``(id, name, category, description, category_id, price)``."""
+        self.postings = defaultdict(dict)
+        self.doc_lengths = {}
+        self.docs = {}
+        for pk, name, category, description, category_id, price in rows:
+            length = 0
+            for text, weight in zip((name, category, description), FIELD_WEIGHTS):
+                for token in tokenize(text):
+                    posting = self.postings[token]
+                    posting[pk] = posting.get(pk, 0.0) + weight
+                    length += weight
+            self.doc_lengths[pk] = length
+            self.docs[pk] = (category_id, Decimal(price))
+        self.vocabulary = sorted(self.postings)
+        self.average_length = (
+            sum(self.doc_lengths.values()) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        )
+
+    @classmethod
+    def from_database(cls):
+        return cls(
+            Product.objects.filter(is_available=True)
+            .values_list('id', 'name', 'category__name', 'description', 'category_id', 'price')
+            .iterator()
+        )
+
+    def _expand(self, term):
+        """All vocabulary tokens starting with ``term``."""
+        vocabulary = self.vocabulary
+        tokens = []
+        position = bisect_left(vocabulary, term)
+        while position < len(vocabulary) and vocabulary[position].startswith(term):
+            tokens.append(vocabulary[position])
+            position += 1
+        return tokens
+
+    def _score_term(self, term):
+        """BM25 scores of every document matching ``term`` as a prefix."""
+        scores = {}
+        total_docs = len(self.doc_lengths)
+        for token in self._expand(term):
+            posting = self.postings[token]
+            idf = math.log(1 + (total_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for pk, tf in posting.items():
+                norm = 1 - self.b + self.b * self.doc_lengths[pk] / self.average_length
+                score = idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                if score > scores.get(pk, 0.0):
+                    scores[pk] = score
+        return scores
+
+    def _matches(self, pk, filters):
+        category_id, price = self.docs[pk]
+        if filters.category_id is not None and category_id != filters.category_id:
+            return False
+        if filters.min_price is not None and price < filters.min_price:
+            return False
+        if filters.max_price is not None and price > filters.max_price:
+            return False
+        return True
+
+    def search(self, terms, filters, offset, limit):
+        """Return ``(ids for the page, total matches)``."""
+        # Rarest term first keeps the candidate set small
+        per_term = sorted((self._score_term(term) for term in terms), key=len)
+        scores = per_term[0]
+        for term_scores in per_term[1:]:
+            scores = {pk: s + term_scores[pk] for pk, s in scores.items() if pk in term_scores}
+        matches = [(score, pk) for pk, score in scores.items() if self._matches(pk, filters)]
+        matches.sort(key=lambda m: (-m[0], -m[1]))
+        return [pk for _, pk in matches[offset:offset + limit]], len(matches)
+
+
+_inverted_index = None
+_inverted_index_lock = threading.Lock()
+
+
+def get_inverted_index():
+    """The process-wide index, rebuilt when the catalog version has changed.
+
+    The version lives in the shared cache, so edits made by other processes
+    are picked up too.
+    """
+    global _inverted_index
+    version = get_catalog_version()
+    index = _inverted_index
+    if index is None or index.catalog_version != version:
+        with _inverted_index_lock:
+            if _inverted_index is None or _inverted_index.catalog_version != version:
+                _inverted_index = InvertedIndex.from_database()
+                _inverted_index.catalog_version = version
+            index = _inverted_index
+    return index
+
+
+def reset_inverted_index():
+    global _inverted_index
+    _inverted_index = None
@@ -0,0 +1,254 @@
+"""Synthetic catalog data for development and benchmarking.
+
+``seed_catalog`` fills the database with sellers, buyers, products, orders
+and carts at whatever scale is asked for (``manage.py seed_catalog``; the
+route benchmark in ``manage.py bench_routes`` uses it on a throwaway test
+database). Everything is written with ``bulk_create`` in batches of
+``batch_size``, so 100k products and a million order items take minutes,
+not hours, and memory use doesn't grow with the order count.
+
+Bulk writes don't send model signals, so the derived data -- sales rollups,
+search index, hot deals, recommendations -- is rebuilt once at the end.
+Creation dates are spread over the last ``days`` days so listings, order
+history and the daily rollups look like a shop that has been running a
+while. The same ``seed`` gives the same catalog.
+"""
+import random
+import secrets
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import search
+from .analytics import rebuild_sales_rollup
+from .catalog import bump_catalog_version
+from .deals import refresh_hot_deals
+from .models import (
+    Cart, CartItem, Category, CustomUser, Order, OrderItem, PriceHistory, Product, SellerProfile,
+)
+from .recommendations import build_recommendations
+
+SEED_PASSWORD = 'seed-password'
+SEED_BATCH_SIZE = 2000
+SEED_IMAGE = 'products/seed.jpg'
+# Distinct creation timestamps per batch when spreading dates
+DATE_BUCKETS = 20
+
+CATEGORY_NAMES = [
+    'Electronics', 'Books', 'Home & Kitchen', 'Toys', 'Sports', 'Garden',
+    'Beauty', 'Clothing', 'Shoes', 'Music', 'Office', 'Pet Supplies',
+    'Automotive', 'Grocery', 'Health', 'Jewelry',
+]
+ADJECTIVES = [
+    'classic', 'compact', 'deluxe', 'durable', 'ergonomic', 'handmade', 'lightweight',
+    'modern', 'portable', 'premium', 'rustic', 'smart', 'vintage', 'wireless', 'organic',
+    'foldable', 'waterproof', 'heavy', 'mini', 'pro',
+]
+NOUNS = [
+    'lamp', 'kettle', 'backpack', 'headphones', 'notebook', 'blender', 'jacket', 'sneakers',
+    'speaker', 'mug', 'keyboard', 'tent', 'watch', 'novel', 'puzzle', 'chair', 'charger',
+    'bottle', 'camera', 'scarf', 'guitar', 'planter', 'blanket', 'drone', 'monitor',
+]
+# Weighted like a live shop: most orders are done and dusted
+ORDER_STATUSES = ['delivered'] * 6 + ['shipped'] * 2 + ['confirmed', 'pending', 'cancelled']
+
+
+@dataclass
+class SeedResult:
+    sellers: int = 0
+    buyers: int = 0
+    products: int = 0
+    orders: int = 0
+    order_items: int = 0
+    carts: int = 0
+    cart_items: int = 0
+    # Seconds per step, in the order they ran
+    timings: dict = field(default_factory=dict)
+
+
+def seed_catalog(
+    sellers=20, buyers=500, products=5000, orders=10_000, items_per_order=4, carts=200,
+    days=365, seed=42, batch_size=SEED_BATCH_SIZE, prefix='seed',
+):
+    """Bulk-create a synthetic catalog; returns a ``SeedResult``.
+
+    Usernames are ``<prefix>-<run>-seller-<n>`` / ``...-buyer-<n>`` with a
+    random ``run`` token, so seeding twice adds to the data instead of
+    failing on duplicates. Every seeded user's password is ``SEED_PASSWORD``.
+    """
+    rng = random.Random(seed)
+    result = SeedResult()
+    run = f'{prefix}-{secrets.token_hex(3)}'
+
+    with _step(result, 'users'):
+        seller_ids = _create_users(run, 'seller', sellers, batch_size)
+        SellerProfile.objects.bulk_create(
+            (SellerProfile(user_id=pk, shop_name=f'Shop {n}') for n, pk in enumerate(seller_ids)),
+            batch_size=batch_size,
+        )
+        buyer_ids = _create_users(run, 'buyer', buyers, batch_size)
+        result.sellers, result.buyers = len(seller_ids), len(buyer_ids)
+
+    with _step(result, 'products'):
+        category_ids = [Category.objects.for_name(name).pk for name in CATEGORY_NAMES]
+        catalog = _create_products(rng, seller_ids, category_ids, products, days, batch_size)
+        result.products = len(catalog)
+
+    if catalog and buyer_ids:
+        with _step(result, 'orders'):
+            result.orders, result.order_items = _create_orders(
+                rng, buyer_ids, catalog, orders, items_per_order, days, batch_size,
+            )
+        with _step(result, 'carts'):
+            result.carts, result.cart_items = _create_carts(
+                rng, buyer_ids[:carts], catalog, batch_size,
+            )
+
+    with _step(result, 'derived'):
+        rebuild_sales_rollup(batch_size=batch_size)
+        search.fts_rebuild()
+        search.reset_inverted_index()
+        refresh_hot_deals()
+        build_recommendations(batch_size=batch_size)
+        bump_catalog_version()
+    return result
+
+
+class _step:
+    """Time a block into ``result.timings[name]``."""
+
+    def __init__(self, result, name):
+        self.result, self.name = result, name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.result.timings[self.name] = time.perf_counter() - self.started
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _create_users(run, role, count, batch_size):
+    # One hash for everyone: hashing per user would dominate the whole seed
+    password = make_password(SEED_PASSWORD)
+    ids = []
+    for batch in _batched(range(count), batch_size):
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'{run}-{role}-{n}',
+                email=f'{run}-{role}-{n}@example.com',
+                password=password,
+                role=role,
+            )
+            for n in batch
+        ])
+        ids.extend(user.pk for user in users)
+    return ids
+
+
+def _create_products(rng, seller_ids, category_ids, count, days, batch_size):
+    """Returns ``[(id, price)]`` for the new products."""
+    catalog = []
+    for batch in _batched(range(count), batch_size):
+        new = []
+        for _ in batch:
+            price = Decimal(rng.randint(199, 99_999)) / 100
+            compare_at = None
+            if rng.random() < 0.2:
+                compare_at = (price * Decimal(rng.uniform(1.1, 1.8))).quantize(Decimal('0.01'))
+            adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+            new.append(Product(
+                seller_id=rng.choice(seller_ids),
+                name=f'{adjective.title()} {noun} {rng.randint(100, 999)}',
+                description=' '.join(rng.choices(ADJECTIVES + NOUNS, k=30)),
+                price=price,
+                compare_at_price=compare_at,
+                quantity=0 if rng.random() < 0.05 else rng.randint(1, 500),
+                category_id=rng.choice(category_ids),
+                image=SEED_IMAGE,
+                return_policy=rng.choice(('7 days', '14 days', '30 days', 'No returns')),
+                is_available=rng.random() > 0.03,
+            ))
+        with transaction.atomic():
+            Product.objects.bulk_create(new)
+            PriceHistory.objects.bulk_create(
+                PriceHistory(product_id=product.pk, price=product.price) for product in new
+            )
+            _spread_dates(Product, [product.pk for product in new], rng, days)
+        catalog.extend((product.pk, product.price) for product in new)
+    return catalog
+
+
+def _create_orders(rng, buyer_ids, catalog, count, items_per_order, days, batch_size):
+    # Each order gets 1..(2 * mean - 1) distinct lines, so the mean is items_per_order
+    max_lines = max(1, 2 * items_per_order - 1)
+    # Popular products sell more: pick from the front of a shuffled catalog more often
+    popular = rng.sample(catalog, len(catalog))
+    item_count = 0
+    for batch in _batched(range(count), max(1, batch_size // items_per_order)):
+        orders, baskets = [], []
+        for _ in batch:
+            lines = {}
+            for _ in range(rng.randint(1, max_lines)):
+                product_id, price = popular[int(len(popular) * rng.random() ** 2)]
+                lines[product_id] = (price, rng.choice((1, 1, 1, 2, 3)))
+            baskets.append(lines)
+            orders.append(Order(
+                buyer_id=rng.choice(buyer_ids),
+                total_amount=sum(price * quantity for price, quantity in lines.values()),
+                status=rng.choice(ORDER_STATUSES),
+                shipping_address=f'{rng.randint(1, 999)} Seed Street',
+            ))
+        with transaction.atomic():
+            Order.objects.bulk_create(orders)
+            items = [
+                OrderItem(order_id=order.pk, product_id=product_id, price=price, quantity=quantity)
+                for order, lines in zip(orders, baskets)
+                for product_id, (price, quantity) in lines.items()
+            ]
+            OrderItem.objects.bulk_create(items, batch_size=batch_size)
+            _spread_dates(Order, [order.pk for order in orders], rng, days)
+        item_count += len(items)
+    return count, item_count
+
+
+def _create_carts(rng, buyer_ids, catalog, batch_size):
+    item_count = 0
+    for batch in _batched(buyer_ids, batch_size):
+        with transaction.atomic():
+            new = Cart.objects.bulk_create(Cart(user_id=pk) for pk in batch)
+            items = [
+                CartItem(cart_id=cart.pk, product_id=product_id, quantity=rng.randint(1, 3))
+                for cart in new
+                for product_id, _ in rng.sample(catalog, min(len(catalog), rng.randint(1, 5)))
+            ]
+            CartItem.objects.bulk_create(items, batch_size=batch_size)
+        item_count += len(items)
+    return len(buyer_ids), item_count
+
+
+def _spread_dates(model, ids, rng, days):
+    """Move ``created_at`` back to random times in the last ``days`` days.
+
+    ``auto_now_add`` overrides whatever bulk_create is given, so this is an
+    ``UPDATE`` per bucket of rows afterwards.
+    """
+    if not ids or days <= 0:
+        return
+    now = timezone.now()
+    rng.shuffle(ids)
+    size = -(-len(ids) // DATE_BUCKETS)
+    for bucket in _batched(ids, size):
+        created = now - timedelta(seconds=rng.randint(0, days * 86_400))
+        model.objects.filter(pk__in=bucket).update(created_at=created)
@@ -1,16 +1,117 @@
 # Work of serializer : It is a predefined /methodology inside the python rest framework. In this the json data is converted into table form
 # To install = pip install djangorestframework
 
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from django.contrib.auth import authenticate
-from .models import SellerRegistration, UserRegistration
 
-class RegisterSerializer(serializers.ModelSerializer):
+from .carts import MAX_CART_QUANTITY
+from .models import CartItem, Category, Order, OrderItem, Product
+
+# Lines in one PATCH /api/cart/
+MAX_CART_BATCH = 100
+
+
+class SparseFieldsMixin:
+    """Let clients pick fields with ``?fields=id,name,price``.
+
+    Unknown names are ignored; without the parameter every field is returned.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = request.query_params.get('fields') if request else None
+        if requested:
+            keep = {name.strip() for name in requested.split(',')}
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
+
+class CategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug']
+
+
+class CategoryListingSerializer(CategorySerializer):
+    product_count = serializers.IntegerField(read_only=True)
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ['product_count']
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    category = CategorySerializer(read_only=True)
+    shop_name = serializers.CharField(source='seller.sellerprofile.shop_name', read_only=True, default=None)
+    images = serializers.SerializerMethodField()
+    url = serializers.HyperlinkedIdentityField(view_name='api_product_detail')
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'url', 'name', 'description', 'price', 'compare_at_price', 'quantity',
+            'category', 'shop_name', 'return_policy', 'images', 'created_at', 'updated_at',
+        ]
+
+    def get_images(self, product):
+        """Absolute URLs of the original and its resized variants (see images.py)."""
+        if not product.image:
+            return None
+        request = self.context.get('request')
+        absolute = request.build_absolute_uri if request else (lambda url: url)
+        images = {'original': absolute(product.image.url)}
+        info = product.image_variants or {}
+        if info.get('source') == product.image.name:
+            for name, variant in info['variants'].items():
+                images[name] = {
+                    'width': variant['width'],
+                    'height': variant['height'],
+                    'webp': absolute(default_storage.url(variant['webp'])),
+                    'jpeg': absolute(default_storage.url(variant['jpeg'])),
+                }
+        return images
+
+
+class CartItemSerializer(serializers.ModelSerializer):
+    product = serializers.IntegerField(source='product_id')
+    name = serializers.CharField(source='product.name')
+    price = serializers.DecimalField(source='product.price', max_digits=10, decimal_places=2)
+    line_total = serializers.DecimalField(source='get_total_price', max_digits=12, decimal_places=2)
+
     class Meta:
-        model = SellerRegistration
-        fields = '__all__'
+        model = CartItem
+        fields = ['product', 'name', 'price', 'quantity', 'line_total', 'added_at']
+
+
+class CartLineUpdateSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0, max_value=MAX_CART_QUANTITY)
+
+
+class CartUpdateSerializer(serializers.Serializer):
+    """``{"items": [{"product": 12, "quantity": 3}, {"product": 7, "quantity": 0}]}``"""
+    items = CartLineUpdateSerializer(many=True, allow_empty=False, max_length=MAX_CART_BATCH)
+
+    def validate_items(self, items):
+        products = [item['product'] for item in items]
+        if len(set(products)) != len(products):
+            raise serializers.ValidationError("Each product may only appear once.")
+        return items
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    product = serializers.IntegerField(source='product_id')
+    name = serializers.CharField(source='product.name')
+
+    class Meta:
+        model = OrderItem
+        fields = ['product', 'name', 'quantity', 'price']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
 
-class UserRegisterSerializer(serializers.ModelSerializer):
     class Meta:
-        model = UserRegistration
-        fields = '__all__'
\ No newline at end of file
+        model = Order
+        fields = ['id', 'status', 'total_amount', 'shipping_address', 'created_at', 'items']
+        read_only_fields = ['status', 'total_amount']
@@ -0,0 +1,107 @@
+from functools import partial
+
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import analytics, images, metrics, search, sqlite
+from .auth import forget_user
+from .catalog import bump_catalog_version
+from .models import Category, CustomUser, Order, PriceHistory, Product, SellerProfile
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def catalog_changed(sender, **kwargs):
+    # After commit, so no request can cache the old rows under the new version
+    transaction.on_commit(bump_catalog_version)
+    search.reset_inverted_index()
+
+
+@receiver(post_save, sender=Product)
+def record_price_change(sender, instance, **kwargs):
+    if instance.price_changed:
+        PriceHistory.objects.create(product=instance, price=instance.price)
+        instance._loaded_price = instance.price
+
+
+@receiver(post_save, sender=Product)
+def process_image(sender, instance, **kwargs):
+    if instance.image_changed:
+        instance._loaded_image = instance.image.name or ''
+        if images.needs_processing(instance):
+            images.schedule_image_processing(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.fts_index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.fts_unindex_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, **kwargs):
+    if not created:
+        search.fts_index_products(instance.products.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, created, **kwargs):
+    # New orders are recorded by orders.place_order with their items
+    was_cancelled = getattr(instance, '_loaded_status', instance.status) == 'cancelled'
+    is_cancelled = instance.status == 'cancelled'
+    if not created and was_cancelled != is_cancelled:
+        items = instance.items.select_related('product')
+        if is_cancelled:
+            analytics.retract_order_sales(instance, items)
+        else:
+            analytics.record_order_sales(instance, items)
+    instance._loaded_status = instance.status
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    # Before the cascade removes the items
+    if instance.status != 'cancelled':
+        analytics.retract_order_sales(instance, instance.items.select_related('product'))
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+@receiver([post_save, post_delete], sender=SellerProfile)
+def user_changed(sender, instance, **kwargs):
+    # Cached for request.user by auth.CachedModelBackend
+    user_id = instance.pk if sender is CustomUser else instance.user_id
+    transaction.on_commit(partial(forget_user, user_id))
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+
+
+@receiver(connection_created)
+def record_queries(sender, connection, **kwargs):
+    metrics.install(connection)
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    sqlite.configure(connection)
+
+
+@receiver(connection_created)
+def recheck_fts_table(sender, connection, **kwargs):
+    search.forget_fts_table(connection.alias)
+
+
+@receiver(post_migrate)
+def recheck_fts_table_after_migrate(sender, using, **kwargs):
+    # Migrations may have created or dropped the FTS table
+    search.forget_fts_table(using)
@@ -0,0 +1,46 @@
+"""SQLite tuning for small single-server deployments.
+
+Applied to every new SQLite connection (hooked up in ``signals.py``):
+
+- ``mmap_size``: read pages through a memory map instead of ``read()`` calls.
+- ``busy_timeout``: wait this long for another writer's lock instead of
+  failing at once with "database is locked".
+- ``temp_store``: sorts and temporary tables stay in memory.
+
+These only last as long as the connection. With ``SQLITE_WAL`` on
+(``DB_SQLITE_WAL=1``, see settings.py) it also sets:
+
+- ``journal_mode=WAL``: readers don't block the writer and the writer
+  doesn't block readers, so page views keep going during a checkout.
+- ``synchronous=NORMAL``: with WAL this only fsyncs at checkpoints. A power
+  cut can lose the last transactions but never corrupts the database.
+
+WAL is opt-in because it is recorded in the database file (and stays on
+until switched back with ``PRAGMA journal_mode=DELETE``), so it would
+otherwise rewrite any SQLite file the project is pointed at, just by
+connecting to it.
+
+Together with ``'transaction_mode': 'IMMEDIATE'`` in the database
+``OPTIONS`` (see settings.py), concurrent writers queue up for the lock
+instead of failing. Other backends are left alone.
+"""
+from django.conf import settings
+
+SQLITE_PRAGMAS = {
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 20_000,
+    'temp_store': 'MEMORY',
+}
+WAL_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+
+def configure(connection):
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    pragmas = {**SQLITE_PRAGMAS, **(WAL_PRAGMAS if settings.SQLITE_WAL else {})}
+    # On the raw connection, so these don't count towards request metrics
+    for pragma, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {pragma} = {value}')
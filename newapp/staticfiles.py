@@ -0,0 +1,225 @@
+"""Hashed, precompressed static files served with far-future cache headers.
+
+``manage.py collectstatic`` is the build step. ``CompressedManifestStaticFilesStorage``
+copies the files to ``STATIC_ROOT`` under content-hashed names
+(``css/style.3f2a9c1b7e04.css``; Django's manifest storage, which also
+rewrites ``url()`` references inside CSS) and writes a gzip copy -- and a
+brotli one, if the ``brotli`` package is installed -- next to every
+compressible file where that saves space.
+
+``StaticFilesMiddleware`` serves ``STATIC_URL`` from ``STATIC_ROOT``, sending
+the smallest copy the client accepts. A hashed name changes whenever the
+content does, so those are sent as ``immutable`` with a one-year max-age and
+returning visitors don't even revalidate them. Unhashed names get a short
+max-age and ``Last-Modified``.
+
+The manifest is read once per process, so after a ``collectstatic`` the server
+must be restarted before ``{% static %}`` hands out the new hashed names.
+"""
+import gzip
+import mimetypes
+import os
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.svg', '.json', '.map', '.txt', '.xml', '.html', '.ico'}
+# Below this the headers outweigh the saving
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+STATIC_CACHE_CONTROL = 'public, max-age=300'
+# (file suffix, Content-Encoding), best first
+ENCODINGS = [('.br', 'br'), ('.gz', 'gzip')]
+
+
+# ---------------------------
+# Build (collectstatic)
+# ---------------------------
+def _compressors():
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+    # mtime=0 so rebuilding unchanged files gives identical bytes
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress(path):
+    """Write ``path.br``/``path.gz`` next to ``path`` where they are worth it; returns their paths."""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = []
+    for suffix, compressor in _compressors():
+        compressed = compressor(data) if len(data) >= MIN_COMPRESS_SIZE else None
+        if compressed is not None and len(compressed) < 0.95 * len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+        elif os.path.exists(path + suffix):
+            # Left over from an earlier build of different content
+            os.remove(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    @property
+    def lenient(self):
+        # Development and test runs usually have no collectstatic output, so
+        # names missing from the manifest are hashed on the fly, or get their
+        # plain URL if they were never collected at all. In production a
+        # missing or stale manifest raises instead of quietly sending
+        # unhashed URLs.
+        return settings.DEBUG or settings.TESTING
+
+    @property
+    def manifest_strict(self):
+        return not self.lenient
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if not self.lenient:
+                raise
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(paths) | set(self.hashed_files.values()):
+            compress(self.path(name))
+
+
+# ---------------------------
+# Serving
+# ---------------------------
+@dataclass(frozen=True)
+class StaticFile:
+    path: str
+    content_type: str
+    mtime: float
+    immutable: bool
+    # Content-Encoding -> path of the precompressed copy, for those that exist
+    variants: dict
+
+
+def accepted_encodings(header):
+    """The content codings an ``Accept-Encoding`` header allows (ignoring ``q=0`` ones)."""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        name, params = name.strip().lower(), params.replace(' ', '')
+        if not name:
+            continue
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name)
+    return accepted
+
+
+class StaticFilesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        static_url = urlsplit(settings.STATIC_URL or '')
+        if not settings.STATIC_ROOT or static_url.netloc or not static_url.path:
+            # Nothing collected, or the files are served from another host
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = static_url.path
+        self.root = os.fspath(settings.STATIC_ROOT)
+        self.hashed = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        # Found hashed files by name. Their content can't change without the
+        # name changing; unhashed ones are stat'ed again on every request so
+        # a collectstatic without a restart doesn't leave stale metadata.
+        self.files = {}
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        """The response for a static file request, or ``None`` to pass the request on."""
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+        static_file = self.find(request.path_info[len(self.prefix):])
+        if static_file is None:
+            return None
+        if not static_file.immutable and not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'), static_file.mtime,
+        ):
+            return HttpResponseNotModified()
+
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = next((e for e in static_file.variants if e in accepted), None)
+        path = static_file.variants.get(encoding, static_file.path)
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=static_file.content_type)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            # FileResponse names the file (the .gz one, for a compressed copy)
+            del response['Content-Disposition']
+        response['Content-Length'] = os.stat(path).st_size
+        response['Last-Modified'] = http_date(static_file.mtime)
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if static_file.immutable else STATIC_CACHE_CONTROL
+        response['X-Content-Type-Options'] = 'nosniff'
+        if static_file.variants:
+            response['Vary'] = 'Accept-Encoding'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        return response
+
+    def find(self, name):
+        static_file = self.files.get(name)
+        if static_file is not None:
+            return static_file
+        if any(name.endswith(suffix) for suffix, _ in ENCODINGS):
+            # The precompressed copies are only sent as an encoding of the original
+            return None
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        content_type, _ = mimetypes.guess_type(name)
+        static_file = StaticFile(
+            path=path,
+            content_type=content_type or 'application/octet-stream',
+            mtime=os.stat(path).st_mtime,
+            immutable=name in self.hashed,
+            variants={
+                encoding: path + suffix
+                for suffix, encoding in ENCODINGS if os.path.isfile(path + suffix)
+            },
+        )
+        if static_file.immutable:
+            self.files[name] = static_file
+        return static_file
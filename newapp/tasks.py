@@ -0,0 +1,193 @@
+"""A small database-backed task queue.
+
+Slow side effects (emails, image resizing, ...) are declared with ``@task``
+and queued from views with ``.enqueue(**kwargs)``::
+
+    @task(max_attempts=3)
+    def send_order_confirmation(order_id):
+        ...
+
+    send_order_confirmation.enqueue(order_id=order.pk)
+
+``enqueue`` just inserts a Task row, inside the caller's transaction, so a
+job only becomes visible to workers once the data it refers to is
+committed (and disappears with it on rollback). ``manage.py runworker``
+claims due tasks, runs them on a thread pool and retries failures with
+exponential backoff until ``max_attempts`` is reached.
+
+Task arguments must be JSON-serializable; pass ids, not model instances.
+"""
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+from importlib import import_module
+
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 60 * 60
+# A task still "running" after this long belongs to a worker that died.
+STALE_AFTER = timedelta(minutes=15)
+
+_registry = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(func=None, *, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Register ``func`` as a task and give it an ``enqueue`` method."""
+    def register(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        _registry[name] = func
+        func.task_name = name
+        func.enqueue = lambda delay=None, **kwargs: enqueue(
+            name, kwargs, delay=delay, max_attempts=max_attempts,
+        )
+        func.enqueue_many = lambda kwargs_list: enqueue_many(
+            name, kwargs_list, max_attempts=max_attempts,
+        )
+        return func
+    return register(func) if func else register
+
+
+def enqueue(name, kwargs=None, delay=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Queue task ``name`` to run after ``delay`` (a timedelta) with ``kwargs``."""
+    return Task.objects.create(
+        name=name,
+        kwargs=kwargs or {},
+        run_at=timezone.now() + (delay or timedelta()),
+        max_attempts=max_attempts,
+    )
+
+
+def enqueue_many(name, kwargs_list, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Queue one run of task ``name`` per kwargs dict, with a single bulk INSERT."""
+    now = timezone.now()
+    return Task.objects.bulk_create([
+        Task(name=name, kwargs=kwargs, run_at=now, max_attempts=max_attempts)
+        for kwargs in kwargs_list
+    ])
+
+
+def get_task(name):
+    """Look up a registered task, importing its module if needed."""
+    if name not in _registry:
+        module, _, _ = name.rpartition('.')
+        try:
+            import_module(module)
+        except ImportError:
+            pass
+    try:
+        return _registry[name]
+    except KeyError:
+        raise UnknownTask(name) from None
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number ``attempts`` (1-based), with jitter."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def requeue_stale(now=None):
+    """Put tasks abandoned by a crashed worker back in the queue; returns how many.
+
+    Ones that have used up their attempts are marked failed instead, so a
+    task that takes its worker down every time isn't retried forever.
+    """
+    now = now or timezone.now()
+    stale = Task.objects.filter(status='running', started_at__lt=now - STALE_AFTER)
+    gave_up = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', updated_at=now,
+        last_error='Abandoned by its worker on the last attempt.',
+    )
+    if gave_up:
+        logger.error("Gave up on %s task(s) abandoned on their last attempt", gave_up)
+    return stale.update(status='queued', run_at=now, locked_by='', updated_at=now)
+
+
+def claim(worker, limit):
+    """Atomically take up to ``limit`` due tasks for ``worker``; returns them.
+
+    Each row is flipped from queued to running with a conditional UPDATE, so
+    two workers can never claim the same task even on databases without
+    ``SELECT ... FOR UPDATE SKIP LOCKED``.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_at__lte=now)
+            .order_by('run_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        claimed = [
+            pk for pk in candidates
+            if Task.objects.filter(pk=pk, status='queued').update(
+                status='running', locked_by=worker, started_at=now,
+                attempts=F('attempts') + 1, updated_at=now,
+            )
+        ]
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_at'))
+
+
+def run(task_row):
+    """Run one claimed task and record the outcome; returns True on success."""
+    try:
+        get_task(task_row.name)(**task_row.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Task %s failed (attempt %s of %s)", task_row, task_row.attempts, task_row.max_attempts)
+        if task_row.attempts < task_row.max_attempts:
+            retry_at = timezone.now() + timedelta(seconds=backoff(task_row.attempts))
+            _finish(task_row, status='queued', run_at=retry_at, last_error=error)
+        else:
+            logger.error("Task %s gave up:\n%s", task_row, error)
+            _finish(task_row, status='failed', last_error=error)
+        return False
+    _finish(task_row, status='done', last_error='')
+    return True
+
+
+def _finish(task_row, **fields):
+    Task.objects.filter(pk=task_row.pk, locked_by=task_row.locked_by).update(
+        locked_by='', updated_at=timezone.now(), **fields,
+    )
+
+
+def run_in_thread(task_row):
+    """``run`` for worker threads, which need their own DB connection hygiene."""
+    close_old_connections()
+    try:
+        return run(task_row)
+    finally:
+        close_old_connections()
+
+
+def run_pending(worker=None, limit=100):
+    """Claim and run due tasks in this thread; returns how many succeeded."""
+    worker = worker or worker_name()
+    return sum(run(task_row) for task_row in claim(worker, limit))
+
+
+def purge_finished(older_than=timedelta(days=7)):
+    """Delete done tasks older than ``older_than``; failed ones are kept for inspection."""
+    return Task.objects.filter(
+        status='done', updated_at__lt=timezone.now() - older_than,
+    ).delete()[0]
@@ -0,0 +1,54 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_picture(product, variant='card', sizes=None, **attrs):
+    """``<picture>`` for a product image, preferring the resized WebP/JPEG variants.
+
+    ``variant`` picks the fallback ``src`` and intrinsic size; browsers choose
+    from every width via ``srcset``/``sizes``. Extra keyword arguments become
+    ``<img>`` attributes, e.g. ``{% product_picture x 'thumb' class='rounded' %}``.
+    """
+    attrs.setdefault('alt', product.name)
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+
+    info = product.image_variants or {}
+    variants = info.get('variants') if info.get('source') == product.image.name else None
+    if not variants or variant not in variants:
+        return format_html('<img src="{}"{}>', product.image.url, _attributes(attrs))
+
+    by_width = sorted(variants.values(), key=lambda v: v['width'])
+    chosen = variants[variant]
+    sizes = sizes or f"{chosen['width']}px"
+    attrs.setdefault('width', chosen['width'])
+    attrs.setdefault('height', chosen['height'])
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}>'
+        '</picture>',
+        _srcset(by_width, 'webp'), sizes,
+        default_storage.url(chosen['jpeg']), _srcset(by_width, 'jpeg'), sizes, _attributes(attrs),
+    )
+
+
+def _srcset(variants, image_format):
+    seen = set()
+    candidates = []
+    for variant in variants:
+        # Small originals give several variants of the same width
+        if variant['width'] not in seen:
+            seen.add(variant['width'])
+            candidates.append(f"{default_storage.url(variant[image_format])} {variant['width']}w")
+    return ', '.join(candidates)
+
+
+def _attributes(attrs):
+    return format_html(''.join(
+        f' {name.replace("_", "-")}="{{}}"' for name in attrs
+    ), *attrs.values())
@@ -1,3 +1,1553 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from PIL import Image
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Q
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import (
+    analytics, api, application, auth, bulk, carts, deals, images, metrics, recommendations, search,
+    seeding, sqlite, staticfiles, tasks, urls,
+)
+from .models import (
+    Cart, CartItem, Category, CustomUser, HotDeal, Order, OrderItem, PriceHistory, Product,
+    ProductDailySales, SellerDailySales, SellerProfile, Task,
+)
+from .catalog import get_catalog_version
+from .forms import ProductForm
+from .orders import CheckoutError, OutOfStock, place_order
+from .pagination import encode_cursor
+
+# What settings.py picks when CACHE_URL points at a shared cache
+CACHED_AUTH = override_settings(
+    AUTHENTICATION_BACKENDS=['newapp.auth.CachedModelBackend', 'django.contrib.auth.backends.ModelBackend'],
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+
+
+def query_plan(queryset):
+    """Return SQLite's EXPLAIN QUERY PLAN output for a queryset as one string."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return '\n'.join(row[-1] for row in cursor.fetchall())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'query plans are checked on SQLite')
+class IndexUsageTests(TestCase):
+    """The hot listing queries must be answered from an index, not a table scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.buyer = CustomUser.objects.create_user('buyer', password='x', role='buyer')
+        cls.category = Category.objects.for_name('Electronics')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = query_plan(queryset)
+        self.assertIn(f'INDEX {index_name}', plan)
+        # A bare "SCAN <table>" line is a full table scan
+        self.assertNotRegex(plan, r'(?m)^SCAN \w+$')
+
+    def test_available_products_newest_first(self):
+        self.assertUsesIndex(
+            Product.objects.filter(is_available=True).order_by('-created_at', '-id'),
+            'product_live_recent_idx',
+        )
+
+    def test_products_by_seller(self):
+        self.assertUsesIndex(
+            Product.objects.filter(seller=self.seller),
+            'product_seller_recent_idx',
+        )
+
+    def test_available_products_by_category(self):
+        queryset = Product.objects.filter(category=self.category, is_available=True)
+        self.assertUsesIndex(queryset, 'product_category_live_idx')
+        self.assertNotIn('TEMP B-TREE', query_plan(queryset.order_by('-created_at', '-id')))
+
+    def test_orders_by_buyer(self):
+        self.assertUsesIndex(
+            Order.objects.filter(buyer=self.buyer),
+            'order_buyer_recent_idx',
+        )
+
+    def test_order_history_page(self):
+        created_at, pk = timezone.now(), 1000
+        self.assertUsesIndex(
+            Order.objects.filter(buyer=self.buyer, status='delivered').filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            ).order_by('-created_at', '-id')[:11],
+            'order_buyer_status_idx',
+        )
+        self.assertNotIn('TEMP B-TREE', query_plan(Order.objects.filter(buyer=self.buyer).order_by('-created_at', '-id')))
+
+    def test_order_items_by_seller(self):
+        plan = query_plan(OrderItem.objects.filter(product__seller=self.seller))
+        self.assertIn('SEARCH newapp_product USING', plan)
+        self.assertIn('SEARCH newapp_orderitem USING INDEX', plan)
+
+
+class PlaceOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.buyer = CustomUser.objects.create_user('buyer', password='x', role='buyer')
+        category = Category.objects.for_name('Electronics')
+        cls.products = [
+            Product.objects.create(
+                seller=cls.seller, name=f'Product {i}', description='', price=10 + i,
+                quantity=5, category=category, image='products/p.jpg', return_policy='7 days',
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.cart = Cart.objects.create(user=self.buyer)
+
+    def test_creates_order_and_takes_stock(self):
+        for product in self.products:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+
+        order = place_order(self.buyer, 'Somewhere 1')
+
+        self.assertEqual(order.total_amount, 2 * (10 + 11 + 12))
+        self.assertEqual(order.items.count(), 3)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+        self.assertEqual(
+            list(Product.objects.order_by('id').values_list('quantity', flat=True)),
+            [3, 3, 3],
+        )
+
+    def test_out_of_stock_rolls_back(self):
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.products[1], quantity=6)
+
+        with self.assertRaises(OutOfStock):
+            place_order(self.buyer, 'Somewhere 1')
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 2)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].quantity, 5)
+
+    def test_empty_cart(self):
+        with self.assertRaisesMessage(CheckoutError, 'Your cart is empty.'):
+            place_order(self.buyer, 'Somewhere 1')
+
+    def test_checkout_refreshes_stock_without_dropping_the_catalog_cache(self):
+        cache.clear()
+        sold, other = self.products[0], self.products[1]
+        sold_url = reverse('product_detail', args=[sold.pk])
+        other_url = reverse('product_detail', args=[other.pk])
+        self.assertContains(self.client.get(sold_url), '5 in stock')
+        self.client.get(other_url)
+        api_etag = self.client.get(reverse('api_product_detail', args=[sold.pk]))['ETag']
+        version = get_catalog_version()
+
+        CartItem.objects.create(cart=self.cart, product=sold, quantity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.buyer, 'Somewhere 1')
+
+        self.assertEqual(get_catalog_version(), version)
+        self.assertContains(self.client.get(sold_url), '3 in stock')
+        with self.assertNumQueries(0):
+            self.client.get(other_url)
+        response = self.client.get(reverse('api_product_detail', args=[sold.pk]), HTTP_IF_NONE_MATCH=api_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['quantity'], 3)
+
+
+class SalesRollupTests(TestCase):
+    """The incrementally maintained rollups must match a full rebuild."""
+
+    @classmethod
+    def setUpTestData(cls):
+        sellers = [CustomUser.objects.create_user(f'seller{i}', role='seller') for i in range(2)]
+        cls.buyer = CustomUser.objects.create_user('buyer', role='buyer')
+        category = Category.objects.for_name('Books')
+        cls.products = [
+            Product.objects.create(
+                seller=sellers[i % 2], name=f'Book {i}', description='', price=5 + i, quantity=100,
+                category=category, image='products/p.jpg', return_policy='7 days',
+            )
+            for i in range(4)
+        ]
+
+    def order(self, *lines):
+        cart, _ = Cart.objects.get_or_create(user=self.buyer)
+        for index, quantity in lines:
+            CartItem.objects.create(cart=cart, product=self.products[index], quantity=quantity)
+        return place_order(self.buyer, 'Home')
+
+    def rollups(self):
+        return (
+            sorted(SellerDailySales.objects.values_list('seller', 'day', 'revenue', 'units', 'orders')),
+            sorted(ProductDailySales.objects.values_list('product', 'seller', 'day', 'revenue', 'units', 'orders')),
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollups()
+        analytics.rebuild_sales_rollup()
+        self.assertEqual(incremental, self.rollups())
+
+    def test_orders_cancellations_and_deletions(self):
+        first = self.order((0, 1), (1, 2))
+        second = self.order((0, 3), (2, 1), (3, 4))
+        third = self.order((1, 1))
+        self.assertMatchesRebuild()
+        self.assertEqual(sum(row[4] for row in self.rollups()[0]), 5)  # 2 + 2 + 1 sellers per order
+
+        second.status = 'cancelled'
+        second.save()
+        self.assertMatchesRebuild()
+        # Cancelling again, or editing a cancelled order, changes nothing
+        Order.objects.get(pk=second.pk).save()
+        self.assertMatchesRebuild()
+
+        second = Order.objects.get(pk=second.pk)
+        second.status = 'confirmed'
+        second.save()
+        self.assertMatchesRebuild()
+
+        third.delete()
+        first.status = 'cancelled'
+        first.save()
+        self.assertMatchesRebuild()
+        self.assertFalse(ProductDailySales.objects.filter(product=self.products[1]).exists())
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        electronics = Category.objects.for_name('Electronics')
+        furniture = Category.objects.for_name('Furniture')
+        for name, category, price in [
+            ('Gaming Laptop', electronics, 900),
+            ('Laptop Stand', furniture, 30),
+            ('Gaming Chair', furniture, 200),
+        ]:
+            Product.objects.create(
+                seller=seller, name=name, description='', price=price, quantity=5,
+                category=category, image='products/p.jpg', return_policy='7 days',
+            )
+        cls.furniture = furniture
+
+    def search(self, query, **filters):
+        results = search.search_products(query, search.SearchFilters(**filters))
+        return [product.name for product in results.products]
+
+    def test_prefix_terms_are_anded(self):
+        self.assertEqual(self.search('gam lap'), ['Gaming Laptop'])
+
+    def test_filters(self):
+        self.assertEqual(self.search('lap', category_id=self.furniture.pk), ['Laptop Stand'])
+        self.assertEqual(self.search('gaming', max_price=500), ['Gaming Chair'])
+
+    def test_non_finite_price_bounds_are_ignored(self):
+        for value in ('NaN', 'sNaN', 'Infinity', '-inf', 'abc'):
+            with self.subTest(value=value):
+                response = self.client.get(reverse('search'), {'q': 'gaming', 'min_price': value})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['results'].total, 2)
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 is SQLite only')
+    def test_fts_table_is_looked_up_once(self):
+        search.forget_fts_table(connection.alias)
+        with self.assertNumQueries(1):
+            self.assertTrue(search.fts_available())
+            self.assertTrue(search.fts_available())
+        search.forget_fts_table(connection.alias)
+        with self.assertNumQueries(1):
+            self.assertTrue(search.fts_available())
+
+    def test_inverted_index_matches_fts(self):
+        index = search.InvertedIndex.from_database()
+        for query in ('gam', 'laptop', 'furn'):
+            ids, total = index.search(search.tokenize(query), search.SearchFilters(), 0, 20)
+            expected = search.search_products(query)
+            self.assertEqual(total, expected.total)
+            self.assertEqual(set(ids), {p.pk for p in expected.products})
+
+
+class CatalogListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+
+        def create(category, count, **fields):
+            for i in range(count):
+                Product.objects.create(
+                    seller=seller, name=f'{category.name} {i}', description='', price=10, quantity=5,
+                    category=category, image='products/p.jpg', return_policy='7 days', **fields,
+                )
+
+        cls.books = Category.objects.for_name('Books')
+        cls.art = Category.objects.for_name('Art')
+        create(cls.books, application.CATEGORY_PAGE_SIZE + 8)
+        create(cls.art, 3)
+        create(cls.books, 1, is_available=False)
+        create(Category.objects.for_name('Sold Out'), 2, is_available=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def newest(self, category):
+        return list(Product.objects.filter(category=category, is_available=True).order_by('-created_at', '-id'))
+
+    def page(self, after=None):
+        url = reverse('category_products', args=['books'])
+        response = self.client.get(url, {'after': after} if after is not None else {})
+        self.assertEqual(response.status_code, 200)
+        return response.context['products'], response.context['next_cursor']
+
+    def test_landing_page_rows(self):
+        rows = self.client.get(reverse('index')).context['categories']
+        # Alphabetical; categories without available products are left out
+        self.assertEqual([row['category'] for row in rows], [self.art, self.books])
+        art, books = rows
+        self.assertEqual(art['products'], self.newest(self.art))
+        self.assertIsNone(art['next_cursor'])
+        self.assertEqual(books['products'], self.newest(self.books)[:application.CATEGORY_ROW_LIMIT])
+
+        # "Load more" carries on right after the last product shown
+        response = self.client.get(
+            reverse('category_products', args=['books']), {'after': books['next_cursor']},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(
+            response.context['products'],
+            self.newest(self.books)[application.CATEGORY_ROW_LIMIT:][:application.CATEGORY_PAGE_SIZE],
+        )
+
+    def test_keyset_pages(self):
+        first, cursor = self.page()
+        self.assertEqual(len(first), application.CATEGORY_PAGE_SIZE)
+        last, last_cursor = self.page(cursor)
+        self.assertEqual(first + last, self.newest(self.books))
+        self.assertIsNone(last_cursor)
+        # A cursor past the last product is an empty page, not an error
+        self.assertEqual(self.page(encode_cursor(last[-1])), ([], None))
+
+    def test_invalid_cursors_give_the_first_page(self):
+        first = self.page()
+        for cursor in ('', 'garbage', '~', 'yesterday~5', '2026-01-01T00:00:00~x', f'{self.art.pk}'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.page(cursor), first)
+
+    def test_unknown_category(self):
+        self.assertEqual(self.client.get(reverse('category_products', args=['sold-out'])).status_code, 404)
+
+
+class CatalogPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.product = Product.objects.create(
+            seller=seller, name='Desk Lamp', description='', price=25, quantity=5,
+            category=Category.objects.for_name('Lighting'), image='products/p.jpg',
+            return_policy='7 days',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_anonymous_views_skip_the_database(self):
+        url = reverse('product_detail', args=[self.product.pk])
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_conditional_get_and_invalidation(self):
+        url = reverse('index')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Floor Lamp'
+            self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Floor Lamp')
+
+    def test_load_more_fragment_and_full_page_are_cached_separately(self):
+        url = reverse('category_products', args=['lighting'])
+        fragment = self.client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertNotContains(fragment, '<html')
+        page = self.client.get(url)
+        self.assertContains(page, '<html')
+        self.assertContains(page, 'Desk Lamp')
+        cached_fragment = self.client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(cached_fragment.content, fragment.content)
+
+    def test_logged_in_users_are_not_served_cached_pages(self):
+        buyer = CustomUser.objects.create_user('buyer', password='x', role='buyer')
+        self.client.force_login(buyer)
+        response = self.client.get(reverse('index'))
+        self.assertNotIn('ETag', response)
+        self.assertContains(response, 'Add to Cart')
+
+
+class HotDealTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.buyer = CustomUser.objects.create_user('buyer', password='x', role='buyer')
+        category = Category.objects.for_name('Electronics')
+
+        def product(name, price, **extra):
+            return Product.objects.create(
+                seller=cls.seller, name=name, description='', price=price, category=category,
+                image='products/p.jpg', return_policy='7 days', **extra,
+            )
+
+        cls.marked_down = product('Headphones', 60, compare_at_price=100, quantity=20)
+        cls.price_drop = product('Speaker', 80, quantity=20)
+        cls.best_seller = product('Cable', 10, quantity=50)
+        cls.full_price = product('Charger', 20, quantity=20)
+        cls.sold_out = product('Tablet', 100, compare_at_price=300, quantity=0)
+
+        cls.price_drop.price = 40
+        cls.price_drop.save()
+        cart = Cart.objects.create(user=cls.buyer)
+        CartItem.objects.create(cart=cart, product=cls.best_seller, quantity=10)
+        place_order(cls.buyer, 'Somewhere 1')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_price_changes_are_recorded(self):
+        self.assertEqual(
+            list(self.price_drop.price_history.order_by('changed_at', 'id').values_list('price', flat=True)),
+            [80, 40],
+        )
+        self.full_price.name = 'USB Charger'
+        self.full_price.save()
+        self.assertEqual(PriceHistory.objects.filter(product=self.full_price).count(), 1)
+
+    def test_ranking(self):
+        ranked = deals.refresh_hot_deals()
+        # Full-price and sold-out products are not deals at all
+        self.assertEqual(
+            [deal.product_id for deal in ranked],
+            [self.price_drop.pk, self.best_seller.pk, self.marked_down.pk],
+        )
+        self.assertEqual(ranked[0].discount_percent, 50)
+        self.assertEqual(ranked[0].reference_price, 80)
+        self.assertEqual(ranked[1].units_sold, 10)
+
+    @CACHED_AUTH
+    def test_page_is_one_cached_read(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            deals.refresh_hot_deals()
+        self.assertEqual(HotDeal.objects.count(), 3)
+        self.client.force_login(self.buyer)
+        self.client.get(reverse('hotdeal'))
+        with self.assertNumQueries(0):  # session, user and deals all come from the cache
+            response = self.client.get(reverse('hotdeal'))
+        self.assertContains(response, '-50%')
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.buyer = CustomUser.objects.create_user('buyer', password='x', role='buyer')
+        electronics = Category.objects.for_name('Electronics')
+        books = Category.objects.for_name('Books')
+        cls.phone, cls.case, cls.charger, cls.novel, cls.camera = [
+            Product.objects.create(
+                seller=seller, name=name, description='', price=10, quantity=100,
+                category=category, image='products/p.jpg', return_policy='7 days',
+            )
+            for name, category in [
+                ('Phone', electronics), ('Case', electronics), ('Charger', electronics),
+                ('Novel', books), ('Camera', electronics),
+            ]
+        ]
+        cart = Cart.objects.create(user=cls.buyer)
+        for basket in [
+            [cls.phone, cls.case],
+            [cls.phone, cls.case, cls.novel],
+            [cls.phone, cls.novel, cls.charger],
+            [cls.charger],
+            [cls.charger],
+        ]:
+            for product in basket:
+                CartItem.objects.create(cart=cart, product=product)
+            place_order(cls.buyer, 'Somewhere 1')
+
+    def test_ranked_by_cosine_similarity(self):
+        self.assertEqual(recommendations.build_recommendations(), 4)
+        # Novel and case share 2 of the phone's 3 orders; the charger 1 of its 3
+        self.assertEqual(
+            list(self.phone.recommendations.values_list('recommended__name', flat=True)),
+            ['Novel', 'Case', 'Charger'],
+        )
+
+    def test_related_products_falls_back_to_category(self):
+        recommendations.build_recommendations()
+        with self.assertNumQueries(2):
+            related = async_to_sync(recommendations.arelated_products)(self.case)
+        # Phone and Novel were bought with the case; the rest is the newest electronics
+        self.assertEqual([p.name for p in related], ['Phone', 'Novel', 'Camera', 'Charger'])
+
+
+class ProductImageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        buffer = BytesIO()
+        Image.new('RGBA', (1200, 600), (200, 30, 30, 255)).save(buffer, 'PNG')
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        self.product = Product.objects.create(
+            seller=seller, name='Poster', description='', price=5, quantity=5,
+            category=Category.objects.for_name('Art'), return_policy='7 days',
+            image=SimpleUploadedFile('poster.png', buffer.getvalue(), content_type='image/png'),
+        )
+
+    def test_unsafe_image_name_is_not_retried(self):
+        Product.objects.filter(pk=self.product.pk).update(image='../../etc/passwd')
+        self.assertFalse(images.process_product_image(self.product.pk))
+
+    def render(self):
+        return Template(
+            "{% load product_images %}{% product_picture product 'card' class='product-img' %}"
+        ).render(Context({'product': self.product}))
+
+    def test_variants(self):
+        self.assertTrue(images.process_product_image(self.product.pk))
+        self.product.refresh_from_db()
+        variants = self.product.image_variants['variants']
+
+        self.assertEqual((variants['card']['width'], variants['card']['height']), (400, 200))
+        self.assertEqual(variants['detail']['width'], 900)
+        for variant in variants.values():
+            with default_storage.open(variant['webp']) as f:
+                self.assertEqual(Image.open(f).format, 'WEBP')
+            with default_storage.open(variant['jpeg']) as f:
+                self.assertEqual(Image.open(f).format, 'JPEG')
+        # Same content, same names: nothing to redo
+        self.assertFalse(images.process_product_image(self.product.pk))
+
+        html = self.render()
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn(f"/media/{variants['thumb']['webp']} 80w", html)
+        self.assertIn('width="400" height="200"', html)
+
+    def test_upload_queues_processing(self):
+        queued = Task.objects.get(name='newapp.images.process_product_image')
+        self.assertEqual(queued.kwargs, {'product_id': self.product.pk})
+        tasks.run_pending()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_variants['source'], self.product.image.name)
+
+    def test_falls_back_to_the_original_until_processed(self):
+        self.assertEqual(
+            self.render(),
+            f'<img src="{self.product.image.url}" class="product-img" alt="Poster" '
+            f'loading="lazy" decoding="async">',
+        )
+
+
+calls = []
+
+
+@tasks.task(max_attempts=2)
+def flaky_task(fail):
+    calls.append(fail)
+    if fail:
+        raise RuntimeError('boom')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_due_tasks(self):
+        flaky_task.enqueue(fail=False)
+        later = flaky_task.enqueue(delay=timedelta(hours=1), fail=False)
+
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(calls, [False])
+        self.assertEqual(Task.objects.get(pk=later.pk).status, 'queued')
+        self.assertEqual(Task.objects.filter(status='done').count(), 1)
+
+    def test_retries_with_backoff_then_gives_up(self):
+        queued = flaky_task.enqueue(fail=True)
+
+        with self.assertLogs('newapp.tasks', 'WARNING'):
+            self.assertEqual(tasks.run_pending(), 0)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('RuntimeError: boom', queued.last_error)
+
+        Task.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        with self.assertLogs('newapp.tasks', 'ERROR'):
+            tasks.run_pending()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('failed', 2))
+        self.assertEqual(calls, [True, True])
+
+    def test_a_claimed_task_is_not_claimed_again(self):
+        flaky_task.enqueue(fail=False)
+        self.assertEqual(len(tasks.claim('worker-1', 10)), 1)
+        self.assertEqual(tasks.claim('worker-2', 10), [])
+
+    def test_stale_tasks_are_requeued_until_out_of_attempts(self):
+        retry, last = flaky_task.enqueue(fail=False), flaky_task.enqueue(fail=False)
+        Task.objects.filter(pk=last.pk).update(attempts=1)
+        tasks.claim('worker-1', 10)  # which then dies
+
+        self.assertEqual(tasks.requeue_stale(), 0)
+        with self.assertLogs('newapp.tasks', 'ERROR'):
+            self.assertEqual(tasks.requeue_stale(now=timezone.now() + tasks.STALE_AFTER * 2), 1)
+        retry.refresh_from_db()
+        last.refresh_from_db()
+        self.assertEqual((retry.status, retry.attempts, retry.locked_by), ('queued', 1, ''))
+        self.assertEqual((last.status, last.attempts, last.locked_by), ('failed', 2, ''))
+
+    def test_order_confirmation_is_sent_by_the_worker(self):
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        buyer = CustomUser.objects.create_user('buyer', email='buyer@example.com', password='x')
+        product = Product.objects.create(
+            seller=seller, name='Kettle', description='', price=30, quantity=5,
+            category=Category.objects.for_name('Kitchen'), image='', return_policy='7 days',
+        )
+        CartItem.objects.create(cart=Cart.objects.create(user=buyer), product=product, quantity=2)
+
+        order = place_order(buyer, 'Somewhere 1')
+        self.assertEqual(mail.outbox, [])
+
+        tasks.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['buyer@example.com'])
+        self.assertIn(f'#{order.pk}', mail.outbox[0].subject)
+        self.assertIn('2 x Kettle', mail.outbox[0].body)
+
+
+class AsyncViewTests(TestCase):
+    """The async catalog views must render without synchronous DB access."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.buyer = CustomUser.objects.create_user('buyer', password='x', role='buyer')
+        category = Category.objects.for_name('Books')
+        cls.products = [
+            Product.objects.create(
+                seller=seller, name=f'Book {i}', description='', price=10, compare_at_price=15,
+                quantity=5, category=category, image='products/p.jpg', return_policy='7 days',
+            )
+            for i in range(3)
+        ]
+        Cart.objects.create(user=cls.buyer)
+        deals.refresh_hot_deals()
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_pages_for_a_logged_in_buyer(self):
+        await self.async_client.aforce_login(self.buyer)
+        for url in (
+            reverse('index'),
+            reverse('hotdeal'),
+            reverse('product_detail', args=[self.products[0].pk]),
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Add to Cart')
+
+    async def test_add_to_cart(self):
+        await self.async_client.aforce_login(self.buyer)
+        url = reverse('add_to_cart', args=[self.products[1].pk])
+        await self.async_client.post(url, {'quantity': 2})
+        response = await self.async_client.post(url)
+        self.assertEqual(response.json()['cart_count'], 3)
+        self.assertEqual(await CartItem.objects.filter(cart__user=self.buyer).acount(), 1)
+
+    async def test_add_to_cart_rejects_bad_requests(self):
+        await self.async_client.aforce_login(self.buyer)
+        url = reverse('add_to_cart', args=[self.products[0].pk])
+        for quantity in (0, 'many', carts.MAX_CART_QUANTITY + 1, 10 ** 20):
+            with self.subTest(quantity=quantity):
+                response = await self.async_client.post(url, {'quantity': quantity})
+                self.assertEqual(response.status_code, 400)
+        response = await self.async_client.post(reverse('add_to_cart', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.json()['success'])
+
+        await self.async_client.post(url, {'quantity': 2})
+        await Product.objects.filter(pk=self.products[0].pk).aupdate(is_available=False)
+        response = await self.async_client.post(url, {'quantity': 2})
+        self.assertEqual(response.status_code, 404)
+        line = await CartItem.objects.aget(cart__user=self.buyer, product=self.products[0])
+        self.assertEqual(line.quantity, 2)
+
+    async def test_line_quantity_is_capped(self):
+        await carts.aadd_item(self.buyer, self.products[0].pk, carts.MAX_CART_QUANTITY)
+        self.assertEqual(await carts.aadd_item(self.buyer, self.products[0].pk, 5), carts.MAX_CART_QUANTITY)
+
+    async def test_add_item(self):
+        self.assertEqual(await carts.aadd_item(self.buyer, self.products[0].pk), 1)
+        self.assertEqual(await carts.aadd_item(self.buyer, self.products[0].pk, 2), 3)
+        self.assertEqual(await carts.aadd_item(self.buyer, self.products[1].pk), 4)
+        self.assertEqual(await carts.aget_cart_summary(self.buyer), {'count': 4, 'total': Decimal('40.00')})
+        with self.assertRaises(Product.DoesNotExist):
+            await carts.aadd_item(self.buyer, 0)
+
+    async def test_missing_product(self):
+        response = await self.async_client.get(reverse('product_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CatalogApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        SellerProfile.objects.create(user=seller, shop_name='Lamp Shop')
+        category = Category.objects.for_name('Lighting')
+        cls.products = [
+            Product.objects.create(
+                seller=seller, name=f'Lamp {i}', description='Bright', price=10 + i, quantity=5,
+                category=category, image='products/p.jpg', return_policy='7 days',
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pagination_newest_first(self):
+        names = []
+        url = reverse('api_products') + '?page_size=2'
+        get_catalog_version()
+        while url:
+            with self.assertNumQueries(1):
+                page = self.client.get(url).json()
+            names += [product['name'] for product in page['results']]
+            url = page['next']
+        self.assertEqual(names, [f'Lamp {i}' for i in reversed(range(5))])
+
+    def test_sparse_fieldsets(self):
+        response = self.client.get(
+            reverse('api_product_detail', args=[self.products[0].pk]) + '?fields=id,price,shop_name'
+        )
+        self.assertEqual(response.json(), {'id': self.products[0].pk, 'price': '10.00', 'shop_name': 'Lamp Shop'})
+
+    def test_conditional_requests(self):
+        response = self.client.get(reverse('api_categories'))
+        self.assertEqual(response.json(), [
+            {'id': self.products[0].category_id, 'name': 'Lighting', 'slug': 'lighting', 'product_count': 5},
+        ])
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertNotIn('Cookie', response['Vary'])
+        again = self.client.get(reverse('api_categories'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+
+class CartOrderApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.buyer = CustomUser.objects.create_user('buyer', password='x', role='buyer')
+        category = Category.objects.for_name('Electronics')
+        cls.products = [
+            Product.objects.create(
+                seller=seller, name=f'Product {i}', description='', price=10 + i,
+                quantity=5, category=category, image='', return_policy='7 days',
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.buyer)
+
+    def patch_cart(self, items):
+        return self.client.patch(reverse('api_cart'), {'items': items}, content_type='application/json')
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_cart')).status_code, 403)
+
+    def test_batch_update_upserts_and_removes(self):
+        a, b, c = self.products
+        cart = Cart.objects.create(user=self.buyer)
+        CartItem.objects.create(cart=cart, product=a, quantity=1)
+        CartItem.objects.create(cart=cart, product=b, quantity=1)
+
+        response = self.patch_cart([
+            {'product': a.pk, 'quantity': 3},
+            {'product': b.pk, 'quantity': 0},
+            {'product': c.pk, 'quantity': 2},
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['summary'], {'count': 5, 'total': '54.00'})
+        self.assertEqual(
+            [(item['product'], item['quantity']) for item in body['items']],
+            [(a.pk, 3), (c.pk, 2)],
+        )
+
+    def test_unavailable_product_changes_nothing(self):
+        a, b, _ = self.products
+        Product.objects.filter(pk=b.pk).update(is_available=False)
+        response = self.patch_cart([{'product': a.pk, 'quantity': 1}, {'product': b.pk, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['unavailable'], [b.pk])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_rejects_duplicate_products(self):
+        a = self.products[0]
+        response = self.patch_cart([{'product': a.pk, 'quantity': 1}, {'product': a.pk, 'quantity': 2}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_checkout_and_list_orders(self):
+        self.patch_cart([{'product': self.products[0].pk, 'quantity': 2}])
+        response = self.client.post(reverse('api_orders'), {'shipping_address': '1 Main St'})
+        self.assertEqual(response.status_code, 201)
+        order = response.json()
+        self.assertEqual(order['total_amount'], '20.00')
+        self.assertEqual([item['quantity'] for item in order['items']], [2])
+
+        listing = self.client.get(reverse('api_orders')).json()
+        self.assertEqual([o['id'] for o in listing['results']], [order['id']])
+        detail = self.client.get(reverse('api_order_detail', args=[order['id']]))
+        self.assertEqual(detail.json()['id'], order['id'])
+
+    def test_checkout_out_of_stock(self):
+        self.patch_cart([{'product': self.products[0].pk, 'quantity': 9}])
+        response = self.client.post(reverse('api_orders'), {'shipping_address': '1 Main St'})
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+
+class CartSummaryTests(TestCase):
+    """The cached navbar cart badge follows every change to the cart."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.buyer = CustomUser.objects.create_user('buyer', password='x', role='buyer')
+        category = Category.objects.for_name('Kitchen')
+        cls.kettle, cls.teapot = [
+            Product.objects.create(
+                seller=seller, name=name, description='', price=price, quantity=10,
+                category=category, image='products/p.jpg', return_policy='7 days',
+            )
+            for name, price in (('Kettle', 10), ('Teapot', 15))
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.buyer)
+
+    def assertBadge(self, count, total):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['cart_summary'], {'count': count, 'total': Decimal(total)})
+        if count:
+            self.assertContains(response, f'bg-danger">{count}</span>')
+        else:
+            self.assertNotContains(response, 'rounded-pill bg-danger')
+
+    def test_cart_changes_update_the_badge(self):
+        self.assertBadge(0, '0.00')
+        self.client.post(reverse('add_to_cart', args=[self.kettle.pk]), {'quantity': 2})
+        self.assertBadge(2, '20.00')
+        self.client.post(reverse('add_to_cart', args=[self.teapot.pk]))
+        self.assertBadge(3, '35.00')
+
+        kettle_line = CartItem.objects.get(cart__user=self.buyer, product=self.kettle)
+        self.client.get(reverse('remove_from_cart', args=[kettle_line.pk]))
+        self.assertBadge(1, '15.00')
+
+        self.client.patch(
+            reverse('api_cart'), {'items': [{'product': self.kettle.pk, 'quantity': 1}]},
+            content_type='application/json',
+        )
+        self.assertBadge(2, '25.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('create_order'), {'shipping_address': 'Home'})
+        self.assertTrue(Order.objects.filter(buyer=self.buyer).exists())
+        self.assertBadge(0, '0.00')
+
+    def test_cart_page_reads_without_writing(self):
+        response = self.client.get(reverse('cart'))
+        self.assertContains(response, 'Your cart is empty')
+        self.assertFalse(Cart.objects.filter(user=self.buyer).exists())
+
+        self.client.post(reverse('add_to_cart', args=[self.kettle.pk]), {'quantity': 3})
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.context['total'], Decimal('30.00'))
+        self.assertEqual([item.product for item in response.context['cart_items']], [self.kettle])
+
+
+class ProductFormTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.electronics = Category.objects.for_name('Electronics')
+
+    def form(self, category, **data):
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, 'PNG')
+        image = SimpleUploadedFile('p.png', buffer.getvalue(), content_type='image/png')
+        return ProductForm({
+            'name': 'Radio', 'description': 'Small', 'price': '20.00', 'quantity': 3,
+            'category': category, 'return_policy': '7 days', 'is_available': True, **data,
+        }, {'image': image})
+
+    def test_category_names_are_folded(self):
+        for name in ('electronics', ' ELECTRONICS ', 'Electronics\t'):
+            with self.subTest(name=name):
+                form = self.form(name)
+                self.assertTrue(form.is_valid(), form.errors)
+                self.assertEqual(form.save(commit=False).category, self.electronics)
+        form = self.form('  home   and KITCHEN ')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save(commit=False).category.name, 'Home And Kitchen')
+        self.assertEqual(Category.objects.for_name('Home and kitchen').name, 'Home And Kitchen')
+        self.assertEqual(Category.objects.count(), 2)
+
+    def test_invalid_submission_creates_no_category(self):
+        form = self.form('Brand New', compare_at_price='10.00')
+        self.assertFalse(form.is_valid())
+        self.assertIn('compare_at_price', form.errors)
+        self.assertFalse(Category.objects.filter(slug='brand-new').exists())
+
+        result = bulk.import_products(self.seller, BytesIO(
+            b'name,price,quantity,category,image,return_policy\n'
+            b'Radio,cheap,3,Brand New,products/radio.jpg,7 days\n'
+        ))
+        self.assertEqual(result.error_count, 1)
+        self.assertFalse(Category.objects.filter(slug='brand-new').exists())
+
+    def test_add_product(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.client.force_login(self.seller)
+        form = self.form('brand  new')
+        with override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post(reverse('addproduct'), {**form.data, **form.files})
+        self.assertRedirects(response, reverse('seller_dashboard'), fetch_redirect_response=False)
+        product = Product.objects.get(name='Radio')
+        self.assertEqual((product.seller, product.category.name), (self.seller, 'Brand New'))
+
+
+class CategoryMigrationTests(TransactionTestCase):
+    """0004 folds the old free-text ``product_type`` into Category rows."""
+    before = [('newapp', '0003_alter_product_options_product_created_at_and_more')]
+    after = [('newapp', '0004_category')]
+
+    def setUp(self):
+        # Back to the latest migration before the tables are flushed
+        self.addCleanup(call_command, 'migrate', 'newapp', verbosity=0)
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        seller = apps.get_model('newapp', 'CustomUser').objects.create(username='seller', role='seller')
+        Product = apps.get_model('newapp', 'Product')
+        for name, product_type in [
+            ('Radio', 'Electronics'), ('Phone', ' electronics '), ('Cable', 'ELECTRONICS'),
+            ('Pan', 'home  and kitchen'), ('Thing', '   '),
+        ]:
+            Product.objects.create(
+                seller=seller, name=name, description='', price=1, quantity=1,
+                product_type=product_type, image='products/p.jpg', return_policy='7 days',
+            )
+
+    def test_product_types_are_folded(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        Product = apps.get_model('newapp', 'Product')
+        self.assertEqual(
+            sorted(apps.get_model('newapp', 'Category').objects.values_list('slug', 'name')),
+            [('electronics', 'Electronics'), ('home-and-kitchen', 'Home And Kitchen'), ('other', 'Other')],
+        )
+        self.assertEqual(
+            dict(Product.objects.values_list('name', 'category__slug')),
+            {'Radio': 'electronics', 'Phone': 'electronics', 'Cable': 'electronics',
+             'Pan': 'home-and-kitchen', 'Thing': 'other'},
+        )
+
+
+class BulkImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.other = CustomUser.objects.create_user('other', password='x', role='seller')
+        category = Category.objects.for_name('Kitchen')
+        cls.product = Product.objects.create(
+            seller=cls.seller, name='Kettle', description='Steel', price=30, quantity=5,
+            category=category, image='products/kettle.jpg', return_policy='7 days',
+        )
+        cls.foreign = Product.objects.create(
+            seller=cls.other, name='Toaster', description='', price=25, quantity=5,
+            category=category, image='products/toaster.jpg', return_policy='7 days',
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        os.makedirs(os.path.join(media_root, 'products'))
+        for name in ['teapot', 'x', 'elsewhere', *(f'mug{i}' for i in range(200))]:
+            open(os.path.join(media_root, 'products', f'{name}.jpg'), 'wb').close()
+        open(os.path.join(media_root, 'outside.jpg'), 'wb').close()
+
+    def csv_file(self, rows, columns=bulk.COLUMNS):
+        lines = [','.join(columns)] + [','.join(str(value) for value in row) for row in rows]
+        return BytesIO('\n'.join(lines).encode())
+
+    def new_rows(self, count):
+        return [
+            ['', f'Mug {i}', 'Ceramic', '4.50', '', 10, 'kitchen', f'products/mug{i}.jpg', '7 days', 'true']
+            for i in range(count)
+        ]
+
+    def test_creates_updates_and_reports_bad_rows(self):
+        version = get_catalog_version()
+        queued = Task.objects.filter(name=images.process_product_image.task_name)
+        queued_before = queued.count()
+        result = bulk.import_products(self.seller, self.csv_file([
+            [self.product.pk, 'Kettle', 'Steel', '27.00', '30.00', 5, 'Kitchen', 'products/kettle.jpg', '7 days', 'true'],
+            ['', 'Teapot', 'Glass', '12.00', '', 3, ' NEW  category ', 'products/teapot.jpg', '14 days', ''],
+            ['', 'Broken', '', 'cheap', '', 3, 'Kitchen', 'products/x.jpg', '7 days', 'true'],
+            [self.foreign.pk, 'Toaster', '', '1.00', '', 1, 'Kitchen', 'products/toaster.jpg', '7 days', 'true'],
+        ]))
+
+        self.assertEqual((result.created, result.updated, result.error_count), (1, 1, 2))
+        self.assertEqual([line for line, _ in result.errors], [4, 5])
+        self.assertIn('price', result.errors[0][1])
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal('27.00'))
+        self.assertEqual(self.product.compare_at_price, Decimal('30.00'))
+        teapot = Product.objects.get(name='Teapot')
+        self.assertEqual((teapot.seller, teapot.category.name, teapot.is_available), (self.seller, 'New Category', True))
+        self.assertEqual(
+            set(PriceHistory.objects.filter(price__in=['27.00', '12.00']).values_list('product_id', flat=True)),
+            {self.product.pk, teapot.pk},
+        )
+        # Only the new product's image needs processing
+        self.assertEqual(queued.count(), queued_before + 1)
+        self.assertEqual(search.search_products('teapot').products, [teapot])
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_image_must_be_an_uploaded_product_image(self):
+        row = ['', 'Mug', 'Ceramic', '4.50', '', 10, 'kitchen', None, '7 days', 'true']
+        paths = [
+            'products/missing.jpg', '../../etc/passwd', '/etc/passwd', 'products/../outside.jpg',
+            'outside.jpg', 'products\\..\\outside.jpg',
+        ]
+        result = bulk.import_products(self.seller, self.csv_file(
+            [row[:7] + [path] + row[8:] for path in paths + ['products/elsewhere.jpg']]
+        ))
+        self.assertEqual((result.created, result.error_count), (1, len(paths)))
+        self.assertTrue(all('image' in message for _, message in result.errors))
+        self.assertEqual(Product.objects.get(name='Mug').image.name, 'products/elsewhere.jpg')
+
+    def test_bulk_writes(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = bulk.import_products(self.seller, self.csv_file(self.new_rows(200)))
+        self.assertEqual(result.created, 200)
+        # A handful of batched statements, not a few queries per row
+        self.assertLess(len(queries), 20)
+
+    def test_missing_columns(self):
+        with self.assertRaisesMessage(bulk.ImportFileError, 'Missing columns: image, return_policy'):
+            bulk.import_products(self.seller, self.csv_file([], columns=['name', 'price', 'quantity', 'category']))
+
+    def test_export_round_trip(self):
+        self.client.force_login(self.seller)
+        for file_format, name in [('csv', 'products.csv'), ('jsonl', 'products.jsonl')]:
+            response = self.client.get(reverse('export_products'), {'format': file_format})
+            export = SimpleUploadedFile(name, b''.join(response.streaming_content))
+            response = self.client.post(reverse('import_products'), {'file': export})
+            result = response.context['result']
+            self.assertEqual((result.created, result.updated, result.error_count), (0, 1, 0))
+        self.assertEqual(Product.objects.count(), 2)
+
+
+@CACHED_AUTH
+class OrderHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        SellerProfile.objects.create(user=seller, shop_name='Shop')
+        cls.buyer = CustomUser.objects.create_user('buyer', password='x', role='buyer')
+        category = Category.objects.for_name('Books')
+        products = [
+            Product.objects.create(
+                seller=seller, name=f'Book {i}', description='', price=5, quantity=100,
+                category=category, image='', return_policy='7 days',
+            )
+            for i in range(5)
+        ]
+        # 25 orders over 25 days, with 1..5 lines each; every other one delivered
+        start = timezone.now() - timedelta(days=30)
+        orders = Order.objects.bulk_create([
+            Order(buyer=cls.buyer, total_amount=5, shipping_address='Home',
+                  status='delivered' if i % 2 else 'pending')
+            for i in range(25)
+        ])
+        for i, order in enumerate(orders):
+            Order.objects.filter(pk=order.pk).update(created_at=start + timedelta(days=i))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=2, price=5)
+            for i, order in enumerate(orders)
+            for product in products[:i % 5 + 1]
+        ])
+        cls.order_ids = [order.pk for order in reversed(orders)]
+        cls.start = start
+
+    def setUp(self):
+        self.client.force_login(self.buyer)
+
+    def test_pages_cost_the_same(self):
+        seen = []
+        url = reverse('my_orders')
+        while url:
+            with self.assertNumQueries(2):  # orders, preview items (session and user are cached)
+                response = self.client.get(url)
+            seen += [order.pk for order in response.context['orders']]
+            for order in response.context['orders']:
+                self.assertLessEqual(len(order.preview_items), 3)
+                self.assertEqual(order.more_items, order.item_count - len(order.preview_items))
+                self.assertEqual(order.unit_count, 2 * order.item_count)
+            query = response.context['next_page_query']
+            url = reverse('my_orders') + '?' + query if query else None
+        self.assertEqual(seen, self.order_ids)
+
+    def test_filters(self):
+        day = (self.start + timedelta(days=3)).date()
+        response = self.client.get(reverse('my_orders'), {
+            'status': 'delivered', 'placed_from': day.isoformat(), 'placed_to': (day + timedelta(days=4)).isoformat(),
+        })
+        orders = response.context['orders']
+        self.assertEqual([order.pk for order in orders], [self.order_ids[-8], self.order_ids[-6], self.order_ids[-4]])
+        self.assertTrue(all(order.status == 'delivered' for order in orders))
+
+    def test_invalid_filters_are_ignored(self):
+        response = self.client.get(reverse('my_orders'), {'status': 'bogus', 'placed_from': 'yesterday'})
+        self.assertEqual(len(response.context['orders']), 10)
+
+
+@CACHED_AUTH
+class CachedUserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        cls.profile = SellerProfile.objects.create(user=cls.seller, shop_name='Lamp Shop')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.seller)
+
+    def request_user(self):
+        return self.client.get(reverse('account')).wsgi_request.user
+
+    def test_no_session_or_user_queries_once_cached(self):
+        self.request_user()
+        with self.assertNumQueries(0):
+            user = self.request_user()
+            self.assertEqual(user.sellerprofile.shop_name, 'Lamp Shop')
+
+    def test_profile_change_is_seen(self):
+        self.request_user()
+        self.profile.shop_name = 'Light Shop'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.save()
+        self.assertEqual(self.request_user().sellerprofile.shop_name, 'Light Shop')
+
+    def test_password_change_ends_other_sessions(self):
+        self.assertTrue(self.request_user().is_authenticated)
+        self.seller.set_password('y')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.save()
+        self.assertFalse(self.request_user().is_authenticated)
+
+    def test_password_change_drops_the_cached_user(self):
+        self.request_user()
+        self.seller.set_password('y')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.save()
+        self.assertIsNone(cache.get(auth.user_cache_key(self.seller.pk)))
+        self.client.force_login(self.seller)
+        self.assertTrue(self.request_user().check_password('y'))
+
+    def test_logout_drops_the_cached_user(self):
+        self.request_user()
+        self.assertIsNotNone(cache.get(auth.user_cache_key(self.seller.pk)))
+        self.client.get(reverse('logout'))
+        self.assertIsNone(cache.get(auth.user_cache_key(self.seller.pk)))
+        self.assertFalse(self.request_user().is_authenticated)
+
+    def test_per_process_cache_is_refused(self):
+        self.assertEqual([e.id for e in auth.check_shared_cache()], ['newapp.E001'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(auth.check_shared_cache(), [])
+        with override_settings(
+            AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'],
+            SESSION_ENGINE='django.contrib.sessions.backends.db',
+        ):
+            self.assertEqual(auth.check_shared_cache(), [])
+
+
+class QueryBudgetTests(TestCase):
+    """Every route with a declared query budget stays within it, with cold caches.
+
+    The fixture has several rows of everything the pages list, so a query
+    per row (an N+1) goes over the budget.
+    """
+    SELLER_ROUTES = {'seller_dashboard', 'showproduct'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('seller', password='x', role='seller')
+        SellerProfile.objects.create(user=cls.seller, shop_name='Shop')
+        cls.buyer = CustomUser.objects.create_user('buyer', password='x', role='buyer')
+        categories = [Category.objects.for_name(name) for name in ('Books', 'Games', 'Music')]
+        cls.products = [
+            Product.objects.create(
+                seller=cls.seller, name=f'Product {i}', description='Good', price=10, compare_at_price=20,
+                quantity=50, category=categories[i % 3], image='products/p.jpg', return_policy='7 days',
+            )
+            for i in range(9)
+        ]
+        for i in range(3):
+            cart = Cart.objects.get_or_create(user=cls.buyer)[0]
+            for product in cls.products[i::3]:
+                CartItem.objects.create(cart=cart, product=product, quantity=1)
+            cls.order = place_order(cls.buyer, 'Home')
+        cart = Cart.objects.get(user=cls.buyer)
+        for product in cls.products[:3]:
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+        deals.refresh_hot_deals()
+        recommendations.build_recommendations()
+
+    def url_kwargs(self, name):
+        return {
+            'category_products': {'slug': 'books'},
+            'product_detail': {'product_id': self.products[0].pk},
+            'api_product_detail': {'pk': self.products[0].pk},
+            'api_order_detail': {'pk': self.order.pk},
+        }.get(name, {})
+
+    def test_routes_stay_within_budget(self):
+        budgeted = [p for p in urls.urlpatterns if metrics.budget_for(p.callback) is not None]
+        self.assertTrue({'index', 'cart', 'my_orders', 'seller_dashboard'} <= {p.name for p in budgeted})
+        for pattern in budgeted:
+            with self.subTest(route=pattern.name):
+                cache.clear()
+                self.client.force_login(self.seller if pattern.name in self.SELLER_ROUTES else self.buyer)
+                url = reverse(pattern.name, kwargs=self.url_kwargs(pattern.name))
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, {'q': 'product'} if pattern.name == 'search' else {})
+                self.assertLess(response.status_code, 400)
+                budget = metrics.budget_for(pattern.callback)
+                self.assertLessEqual(
+                    len(queries), budget,
+                    f'{url} ran {len(queries)} queries:\n' + '\n'.join(q['sql'] for q in queries),
+                )
+
+    def fill_cart(self, lines=5):
+        cart, _ = Cart.objects.get_or_create(user=self.buyer)
+        cart.items.all().delete()
+        for product in self.products[:lines]:
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+
+    def test_writes_stay_within_budget(self):
+        five_lines = [{'product': p.pk, 'quantity': 2} for p in self.products[:5]]
+        writes = {
+            ('api_cart', 'PATCH'): lambda: self.client.patch(
+                reverse('api_cart'), {'items': five_lines}, content_type='application/json',
+            ),
+            ('add_to_cart', 'POST'): lambda: self.client.post(
+                reverse('add_to_cart', args=[self.products[8].pk]), {'quantity': 1},
+            ),
+            ('api_orders', 'POST'): lambda: self.client.post(reverse('api_orders'), {'shipping_address': 'Home'}),
+            ('create_order', 'POST'): lambda: self.client.post(reverse('create_order'), {'shipping_address': 'Home'}),
+        }
+        declared = {
+            (pattern.name, method): budget
+            for pattern in urls.urlpatterns
+            for method, budget in metrics.budgets_for(pattern.callback).items()
+            if method != 'GET'
+        }
+        self.assertEqual(set(declared), set(writes))
+
+        self.client.force_login(self.buyer)
+        for (name, method), request in writes.items():
+            with self.subTest(route=name, method=method):
+                # The expensive cases: the buyer's first add creates the
+                # cart, the day's first checkout creates the rollup rows
+                if name == 'add_to_cart':
+                    Cart.objects.filter(user=self.buyer).delete()
+                else:
+                    self.fill_cart()
+                ProductDailySales.objects.all().delete()
+                SellerDailySales.objects.all().delete()
+                with CaptureQueriesContext(connection) as queries:
+                    response = request()
+                self.assertLess(response.status_code, 400)
+                if name in ('api_orders', 'create_order'):
+                    # Checked out all five lines (create_order redirects either way)
+                    self.assertFalse(CartItem.objects.filter(cart__user=self.buyer).exists())
+                self.assertLessEqual(
+                    len(queries), declared[name, method],
+                    f'{method} {name} ran {len(queries)} queries:\n' + '\n'.join(q['sql'] for q in queries),
+                )
+
+    def test_budgets_are_per_method(self):
+        self.assertEqual(metrics.budget_for(api.CartView.as_view(), 'HEAD'), 4)
+        self.assertEqual(metrics.budget_for(api.CartView.as_view(), 'PATCH'), 12)
+        self.assertIsNone(metrics.budget_for(application.add_to_cart))
+        self.assertIsNone(metrics.budget_for(application.cart, 'DELETE'))
+
+    def test_server_timing_and_perf_page(self):
+        metrics.clear()
+        self.client.force_login(self.buyer)
+        for name, kwargs in [('my_orders', {}), ('product_detail', self.url_kwargs('product_detail'))]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name, kwargs=kwargs))
+            self.assertRegex(
+                response['Server-Timing'],
+                r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$',
+            )
+            recorded = metrics.recent_requests()[0]
+            self.assertEqual((recorded.view, recorded.status), (name, 200))
+            # The async view's queries run on another thread; they count too
+            self.assertEqual(recorded.queries, len(queries))
+            self.assertGreater(recorded.template_time, 0)
+
+        self.assertEqual(self.client.get(reverse('perf')).status_code, 302)
+        staff = CustomUser.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        self.assertContains(self.client.get(reverse('perf')), '<code>my_orders</code>')
+
+    def test_over_budget_is_logged(self):
+        self.client.force_login(self.buyer)
+        with patch.object(application.my_orders, 'query_budget', 1):
+            with self.assertLogs('newapp.metrics', 'WARNING') as logs:
+                self.client.get(reverse('my_orders'))
+        self.assertIn('my_orders ran', logs.output[0])
+
+
+class SeedCatalogTests(TestCase):
+    def test_seeds_consistent_data_at_the_requested_scale(self):
+        result = seeding.seed_catalog(
+            sellers=2, buyers=5, products=40, orders=30, items_per_order=3, carts=4,
+            days=30, batch_size=16,
+        )
+        self.assertEqual(CustomUser.objects.filter(role='seller').count(), 2)
+        self.assertEqual(SellerProfile.objects.count(), 2)
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(PriceHistory.objects.count(), 40)
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertEqual(OrderItem.objects.count(), result.order_items)
+        self.assertEqual(Cart.objects.count(), 4)
+        self.assertEqual(CartItem.objects.count(), result.cart_items)
+
+        for order in Order.objects.with_items()[:10]:
+            self.assertEqual(order.total_amount, sum(i.price * i.quantity for i in order.items.all()))
+        oldest = Order.objects.order_by('created_at').first().created_at
+        self.assertLess(oldest, timezone.now() - timedelta(days=1))
+        # Derived data is rebuilt, since bulk writes send no signals
+        self.assertTrue(ProductDailySales.objects.exists())
+        self.assertTrue(HotDeal.objects.exists())
+        noun = Product.objects.first().name.split()[1]
+        self.assertGreater(search.search_products(noun).total, 0)
+
+    def test_seeding_twice_adds_users(self):
+        seeding.seed_catalog(sellers=1, buyers=1, products=1, orders=1, carts=0)
+        seeding.seed_catalog(sellers=1, buyers=1, products=1, orders=1, carts=0)
+        self.assertEqual(CustomUser.objects.count(), 4)
+        self.assertTrue(self.client.login(
+            username=CustomUser.objects.first().username, password=seeding.SEED_PASSWORD,
+        ))
+
+
+@skipUnless(
+    connection.vendor == 'sqlite' and not connection.is_in_memory_db(),
+    'needs an on-disk SQLite database (DB_ENGINE=sqlite)',
+)
+class SQLiteConcurrencyTests(TransactionTestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connections_are_tuned(self):
+        self.assertEqual(self.pragma('busy_timeout'), sqlite.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(self.pragma('temp_store'), 2)  # MEMORY
+
+    def test_wal_is_opt_in(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for wal, expected in [(False, ('delete', 2)), (True, ('wal', 1))]:  # synchronous FULL / NORMAL
+            path = os.path.join(directory, f'wal-{wal}.sqlite3')
+            with self.subTest(wal=wal), override_settings(SQLITE_WAL=wal):
+                other = connection.copy()
+                other.settings_dict['NAME'] = path
+                try:
+                    other.ensure_connection()
+                    modes = [other.connection.execute(f'PRAGMA {name}').fetchone()[0]
+                             for name in ('journal_mode', 'synchronous')]
+                finally:
+                    other.close()
+                self.assertEqual(tuple(modes), expected)
+
+    def test_parallel_checkouts_do_not_lock(self):
+        seller = CustomUser.objects.create_user('seller', role='seller')
+        product = Product.objects.create(
+            seller=seller, name='Lamp', description='Bright', price=10, quantity=6,
+            category=Category.objects.for_name('Home'), image='products/p.jpg', return_policy='7 days',
+        )
+        buyers = [CustomUser.objects.create_user(f'buyer{i}') for i in range(8)]
+        for buyer in buyers:
+            CartItem.objects.create(cart=Cart.objects.create(user=buyer), product=product, quantity=1)
+
+        start = threading.Barrier(len(buyers))
+        outcomes = []
+
+        def checkout(buyer):
+            try:
+                start.wait()
+                place_order(buyer, 'Home')
+                outcomes.append('ok')
+            except OutOfStock:
+                outcomes.append('out of stock')
+            except Exception as e:
+                outcomes.append(repr(e))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(buyer,)) for buyer in buyers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ['ok'] * 6 + ['out of stock'] * 2)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 0)
+        self.assertEqual(Order.objects.count(), 6)
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        settings_override = override_settings(STATIC_ROOT=static_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.static_root = static_root
+
+    def test_collectstatic_writes_hashed_compressed_copies(self):
+        url = static('css/style.css')
+        self.assertRegex(url, r'^/static/css/style\.[0-9a-f]{12}\.css$')
+        path = f"{self.static_root}/{url.removeprefix('/static/')}"
+        with open(path, 'rb') as original, open(path + '.gz', 'rb') as compressed:
+            self.assertLess(len(compressed.read()), len(original.read()) / 2)
+        if staticfiles.brotli is not None:
+            self.assertTrue(os.path.exists(path + '.br'))
+        self.assertIn(url, self.client.get(reverse('support')).content.decode())
+
+    def test_serves_precompressed_files_with_far_future_headers(self):
+        url = static('css/style.css')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], staticfiles.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        response.close()
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='identity, gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(int(response['Content-Length']), len(b''.join(response.streaming_content)))
+
+    def test_head_sends_the_length_without_a_body(self):
+        url = static('css/style.css')
+        get = self.client.get(url)
+        head = self.client.head(url)
+        self.assertEqual(head.status_code, 200)
+        self.assertEqual(head['Content-Length'], get['Content-Length'])
+        self.assertEqual(head.content, b'')
+        self.assertNotIn('Content-Disposition', get)
+        get.close()
+
+    def test_unhashed_names_revalidate(self):
+        response = self.client.get('/static/css/style.css')
+        self.assertEqual(response['Cache-Control'], staticfiles.STATIC_CACHE_CONTROL)
+        response.close()
+        response = self.client.get('/static/css/style.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unhashed_files_are_checked_again_on_each_request(self):
+        path = f'{self.static_root}/css/style.css'
+        response = self.client.get('/static/css/style.css', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response.close()
+
+        # A collectstatic run while the server is up
+        os.utime(path, (0, 0))
+        os.remove(path + '.gz')
+        response = self.client.get('/static/css/style.css', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Last-Modified'], http_date(0))
+        self.assertNotIn('Content-Encoding', response)
+        response.close()
+
+    def test_only_serves_collected_files(self):
+        for path in ['/static/../manage.py', '/static/css/style.css.gz', '/static/missing.css']:
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_missing_manifest_entries_only_fall_back_outside_production(self):
+        self.assertEqual(static('css/missing.css'), '/static/css/missing.css')
+        with override_settings(DEBUG=False, TESTING=False):
+            with self.assertRaises(ValueError):
+                static('css/missing.css')
+            self.assertRegex(static('css/style.css'), r'^/static/css/style\.[0-9a-f]{12}\.css$')
+
+    def test_accepted_encodings(self):
+        self.assertEqual(staticfiles.accepted_encodings('gzip, br;q=0, deflate;q=0.5'), {'gzip', 'deflate'})
+        self.assertEqual(staticfiles.accepted_encodings(''), set())
@@ -1,12 +1,16 @@
 from django.urls import path
-from . import application, seller
+from rest_framework.authtoken.views import obtain_auth_token
+from . import api, application, seller
 
 urlpatterns = [
     # Home and static pages
     path('', application.index, name='index'),
     path('index/', application.index, name='index'),
     path('hotdeal/', application.hotdealpage, name='hotdeal'),
+    path('search/', application.search, name='search'),
+    path('category/<slug:slug>/', application.category_products, name='category_products'),
     path('support/', application.support, name='support'),
+    path('perf/', application.perf, name='perf'),
     
     # Authentication
     path('register/', application.register, name='register'),
@@ -33,9 +37,20 @@ urlpatterns = [
     path('products/', application.showproduct, name='showproduct'),
     path('product/update/<int:product_id>/', application.updateproduct, name='updateproduct'),
     path('product/delete/<int:product_id>/', application.deleteproduct, name='deleteproduct'),
+    path('products/import/', application.import_products, name='import_products'),
+    path('products/export/', application.export_products, name='export_products'),
     path('product/<int:product_id>/', application.product_detail, name='product_detail'),
     
     # Seller pages
     path('becomeseller/', seller.becomeseller, name='becomeseller'),
     path('seller/', seller.sellerpage, name='sellerpage'),
+
+    # JSON API
+    path('api/products/', api.ProductList.as_view(), name='api_products'),
+    path('api/products/<int:pk>/', api.ProductDetail.as_view(), name='api_product_detail'),
+    path('api/categories/', api.CategoryList.as_view(), name='api_categories'),
+    path('api/cart/', api.CartView.as_view(), name='api_cart'),
+    path('api/orders/', api.OrderList.as_view(), name='api_orders'),
+    path('api/orders/<int:pk>/', api.OrderDetail.as_view(), name='api_order_detail'),
+    path('api/auth/token/', obtain_auth_token, name='api_token'),
 ]
\ No newline at end of file
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,6 +27,10 @@ SECRET_KEY = 'django-insecure-#4j)(rw!ww08*irj-p^zz%waj7%j&b2_8-!-jt+y#@--mk2alx
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# "manage.py test" runs with DEBUG off; code that is lenient in development
+# (see newapp/staticfiles.py) checks this too.
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = []
 
 
@@ -39,10 +44,15 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'rest_framework.authtoken',
     'newapp',
 ]
 
 MIDDLEWARE = [
+    # Static files are answered before anything else runs (see newapp/staticfiles.py)
+    'newapp.staticfiles.StaticFilesMiddleware',
+    # First of the rest, so its query count and latency cover the whole stack
+    'newapp.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,7 +66,8 @@ ROOT_URLCONF = 'seventhjune.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The stock Django backend plus render timing for newapp.metrics
+        'BACKEND': 'newapp.metrics.DjangoTemplates',
         'DIRS': [BASE_DIR, os.path.join('userinterface')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,6 +75,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'newapp.context_processors.cart_summary',
+                'newapp.context_processors.catalog_version',
             ],
         },
     },
@@ -77,20 +90,108 @@ LOGIN_URL = '/login/'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = { # Changed this on 25th june
+# Configured from the environment: DB_ENGINE is sqlite, mysql, postgresql or
+# a full backend path. Connections are kept open for DB_CONN_MAX_AGE seconds
+# and checked before reuse, instead of reconnecting on every request.
+
+DB_ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'mysql': 'django.db.backends.mysql',
+    'postgresql': 'django.db.backends.postgresql',
+}
+DB_ENGINE = DB_ENGINES.get(os.environ.get('DB_ENGINE', 'mysql'), os.environ.get('DB_ENGINE'))
+
+# SQLite only: put the database in WAL mode (DB_SQLITE_WAL=1). Off unless
+# asked for, because the journal mode is stored in the database file itself
+# and WAL leaves -wal/-shm files next to it; see newapp/sqlite.py.
+SQLITE_WAL = os.environ.get('DB_SQLITE_WAL') == '1'
+
+if DB_ENGINE == DB_ENGINES['sqlite']:
+    # mmap and the busy timeout (plus WAL, if enabled above) are set on each
+    # new connection in newapp/signals.py (see newapp/sqlite.py). IMMEDIATE
+    # transactions take the write lock up front, so a transaction that reads
+    # and then writes (checkout) waits its turn instead of failing with
+    # "database is locked" when another writer got there first.
+    db_config = {
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # On disk, so tests can exercise concurrent writers
+        'TEST': {
+            'NAME': os.environ.get('DB_TEST_NAME', BASE_DIR / 'test_db.sqlite3'),
+        },
+    }
+else:
+    db_config = {
+        'NAME': os.environ.get('DB_NAME', 'ESTD2'),
+        'USER': os.environ.get('DB_USER', 'root'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'Garvbhardwaj14'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '3306' if DB_ENGINE == DB_ENGINES['mysql'] else ''),
+    }
+
+DATABASES = {
     'default': {
-        # 'ENGINE': 'django.db.backends.sqlite3',
-        # 'NAME': BASE_DIR / 'db.sqlite3',
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'ESTD2',
-        'USER': 'root',
-        'PASSWORD': 'Garvbhardwaj14',
-        'HOST': 'localhost',
-        'PORT': 3306,
+        'ENGINE': DB_ENGINE,
+        **db_config,
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Catalog pages, fragments, the catalog version and (see below) sessions and
+# the logged-in user live here. Set CACHE_URL (redis://host:6379/0) wherever
+# more than one worker serves requests: local memory is per process, so a
+# change made through one worker would never reach the others.
+
+CACHE_URL = os.environ.get('CACHE_URL')
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'seventhjune',
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            },
+        }
     }
+
+
+# REST API
+# Browsers use their session (with CSRF); mobile clients and partners send
+# "Authorization: Token <key>" (POST /api/auth/token/ to get one).
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.TokenAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
 }
 
 
+# Email
+# Order confirmations are sent by the task worker (manage.py runworker).
+# Swap in the SMTP backend and its settings in production.
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'SeventhJune <no-reply@seventhjune.local>'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -131,6 +232,21 @@ STATICFILES_DIRS = [ #----> Copied this from the django docs where we searched i
     BASE_DIR / "static"
 ]
 
+# "manage.py collectstatic" is the build step: it writes content-hashed
+# copies plus .gz (and, with the brotli package, .br) versions to STATIC_ROOT,
+# which newapp.staticfiles.StaticFilesMiddleware serves with immutable
+# far-future cache headers.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'newapp.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR/'media/'
 
@@ -141,4 +257,23 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 # Auth user model :
-AUTH_USER_MODEL = 'newapp.CustomUser'
\ No newline at end of file
+AUTH_USER_MODEL = 'newapp.CustomUser'
+
+# With a shared cache, the logged-in user (with their seller profile) is
+# served from the cache, and sessions are read from the cache and written
+# through to the database, so a cache miss (eviction, restart) falls back to
+# the table. ModelBackend stays listed so sessions created before it keep
+# working. Without one, logout, a password change or deactivation would only
+# reach the worker that handled it, so both stay on the database (enforced by
+# the check in newapp/auth.py).
+if CACHE_URL:
+    AUTHENTICATION_BACKENDS = [
+        'newapp.auth.CachedModelBackend',
+        'django.contrib.auth.backends.ModelBackend',
+    ]
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    AUTHENTICATION_BACKENDS = [
+        'django.contrib.auth.backends.ModelBackend',
+    ]
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'